@@ -34,47 +34,83 @@
 from glob import glob
 import re
 import sys
-from zipfile import ZipFile
+from zipfile import ZipFile, ZipInfo
 import os
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 import datetime
-import shutil
 from enum import Enum
-from typing import Union
+from typing import Union, Iterable
+from functools import cached_property
 from luaparser import ast, astnodes
 import argparse
 import time
-
-from tools.lib.util import decode_escapes, print_list
+import json
+import hashlib
+import itertools
+import difflib
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from tools.lib.util import decode_escapes, print_list, file_hash, bounded_map
+from tools.lib.parsing import Tokenizer
 import tools.lib.addon as addon
+from tools.lib.lua import find_string_calls, DependencyGraph
+from tools.lib.dmx import DmxError, read_asset_references
+from tools.lib.archive import compress, write_entry, copy_entry, compression_methods, raw_writes
+from tools.lib.files import is_up_to_date, place_file, copy_modes
+from tools.lib.upload import DriveBackend, LocalBackend, upload_files
 import tools.lua_doc_to_html as luadoc
 
 release_path = addon.root.joinpath('release/')
 
-from pydrive.auth import GoogleAuth
-from pydrive.drive import GoogleDrive
-from pydrive.auth import RefreshError
+# Google Drive folder releases are uploaded to
+drive_folder_id = '1SCVtkcVs6I3Gwhqqehh7NsR74qs_fAq-'
+# Files uploaded by an unfinished upload so it can carry on after an error
+upload_journal_path = addon.root.joinpath('.upload_journal.jsonl')
 
 #region Parsing
 
-def parse_readme(path):
+# Lines of a README that are only a path to a file, optionally as a list item
+readme_path_regex = re.compile(r'^[ \t]*(?:-[ \t]*)?(?P<path>[^\s#>*`\[\]()<|"?:][^\n*`\[\]()<>|"?:]*\.\w+)[ \t]*$', re.MULTILINE)
+
+# Candidate paths found in READMEs by the hash of their contents
+readme_asset_paths:dict[str,list[str]]|None = None
+readme_asset_paths_used:dict[str,list[str]] = {}
+
+def parse_readme(path, fingerprint:'PlanFingerprint|None' = None):
     """Parses a README.md to find any asset paths.
 
+    Only lines that look like a path to a file are checked, and they are looked up
+    in the addon file index instead of on disk. The paths found in a README are
+    cached by its hash so unchanged READMEs aren't searched again.
+
     Args:
         path (str): Path to the README.md
+        fingerprint (PlanFingerprint, optional): Records every path checked.
 
     Returns:
         list[str]: List of assets.
     """
+    global readme_asset_paths
+    if readme_asset_paths is None:
+        readme_asset_paths = load_readme_asset_paths()
+    with open(path, 'rb') as file:
+        data = file.read()
+    digest = hashlib.sha1(data).hexdigest()
+    candidates = readme_asset_paths.get(digest)
+    if candidates is None:
+        candidates = [m['path'] for m in readme_path_regex.finditer(data.decode('utf-8', errors='replace'))]
+        readme_asset_paths[digest] = candidates
+    readme_asset_paths_used[digest] = candidates
+
     assets:list[str] = []
-    with open(path, 'r') as file:
-        for line in file:
-            line = line.strip()
-            if line.startswith('-'):
-                line = line[1:]
-                line = line.strip()
-            if os.path.exists(line):
-                assets.append(line)
+    for candidate in candidates:
+        # READMEs are written on Windows so paths may use either separator
+        candidate = os.path.normpath(candidate.replace('\\', '/'))
+        if fingerprint is not None:
+            for searched in addon.searched_content_paths(candidate):
+                fingerprint.add(searched)
+        assets.extend(addon.find_content_files(candidate))
     return assets
 
 
@@ -90,36 +126,167 @@ lua_funcs = [
 
 lua_cached_files:dict[str,list[str]] = {}
 
+# Required scripts found in previous runs so unchanged scripts aren't scanned again
+lua_cache_path = addon.root.joinpath('.lua_cache.json')
+lua_cache:dict|None = None
+lua_cache_changed = False
+
+def lua_cache_version() -> str:
+    """Gets a hash of everything besides the scripts themselves that changes which requires are found.
+
+    Returns:
+        str: Scanner hash.
+    """
+    h = hashlib.sha1()
+    h.update(f'{",".join(lua_funcs)}|{LUA_FULL_PARSE}'.encode())
+    tools_path = Path(addon.__file__).parent
+    # The require name to path mapping lives in this file
+    for source in (Path(__file__), tools_path.joinpath('lua.py'), tools_path.joinpath('parsing.py')):
+        h.update(source.read_bytes())
+    return h.hexdigest()
+
+def load_lua_cache() -> dict:
+    """Loads the Lua dependency cache, or an empty one if it doesn't exist or is out of date.
+
+    The cache is out of date when the scanning mode or the scanner source changes.
+
+    Returns:
+        dict: The cache with 'version' and 'files' keys.
+    """
+    version = lua_cache_version()
+    if USE_CACHE and lua_cache_path.exists():
+        try:
+            with open(lua_cache_path, 'r') as f:
+                cache = json.load(f)
+            if cache.get('version') == version:
+                return cache
+        except (OSError, ValueError):
+            pass
+    return {'version': version, 'files': {}}
+
+def save_lua_cache():
+    global lua_cache_changed
+    if lua_cache is not None and lua_cache_changed:
+        with open(lua_cache_path, 'w') as f:
+            json.dump(lua_cache, f)
+        lua_cache_changed = False
+
+def get_lua_call_strings(src:str)->list[str]:
+    """Uses the full Lua parser to find the strings passed to any of `lua_funcs`.
+
+    Args:
+        src (str): Lua source code.
+
+    Returns:
+        list[str]: Strings found.
+    """
+    tree = ast.parse(src)
+    strings:list[str] = []
+    for node in ast.walk(tree):
+        if isinstance(node, astnodes.Call) and isinstance(node.func, astnodes.Name):
+            if node.func.id in lua_funcs:
+                for arg in node.args:
+                    if isinstance(arg, astnodes.String):
+                        s = arg.s
+                        # Newer versions of luaparser give raw bytes
+                        if isinstance(s, bytes): s = s.decode()
+                        strings.append(s)
+    return strings
+
 def get_required_from_lua(lua_file:str)->list[str]:
     """Searches a Lua script for any other scripts it calls upon.
 
+    Scripts are scanned lexically unless the full parser is forced or the
+    scan finds something ambiguous. Results are cached on disk by modified time and size.
+
     Args:
         lua_file (str): Path to the Lua file.
 
     Returns:
         list[str]: List of script files found.
     """
+    global lua_cache, lua_cache_changed
     if not os.path.exists(lua_file): return []
     abspath = os.path.abspath(lua_file)
     # Return cached files instead of re-parsing the script
     if abspath in lua_cached_files:
         return list(lua_cached_files[abspath])
-    # Get the source string
-    with open(lua_file) as f:
-        src = f.read()
-    tree = ast.parse(src)
-    lua_cached_files[abspath] = []
-    for node in ast.walk(tree):
-        if isinstance(node, astnodes.Call) and isinstance(node.func, astnodes.Name):
-            if node.func.id in lua_funcs:
-                for arg in node.args:
-                    if isinstance(arg, astnodes.String):
-                        s = arg.s
-                        fixed = s.removesuffix('.lua').replace('.','/')
-                        path = f'scripts/vscripts/{fixed}.lua'
-                        lua_cached_files[abspath].append(path)
+    if lua_cache is None:
+        lua_cache = load_lua_cache()
+    stat = os.stat(abspath)
+    key = os.path.relpath(abspath, addon.root)
+    entry = lua_cache['files'].get(key)
+    if entry is None or entry['mtime'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+        # Get the source string
+        with open(lua_file) as f:
+            src = f.read()
+        strings = None if LUA_FULL_PARSE else find_string_calls(src, lua_funcs)
+        if strings is None:
+            strings = get_lua_call_strings(src)
+        requires = []
+        for s in strings:
+            fixed = s.removesuffix('.lua').replace('.','/')
+            requires.append(f'scripts/vscripts/{fixed}.lua')
+        entry = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'requires': requires}
+        lua_cache['files'][key] = entry
+        lua_cache_changed = True
+    lua_cached_files[abspath] = list(entry['requires'])
     return list(lua_cached_files[abspath])
 
+# Every script is scanned once no matter how many categories require it
+lua_dependencies = DependencyGraph(get_required_from_lua)
+
+def get_vmap_references(vmap_file:str)->list[str]:
+    """Gets the assets a map references, such as the scripts and models used by a prefab.
+
+    Only the asset references saved at the start of the map are read, not its entities.
+
+    Args:
+        vmap_file (str): Path to the .vmap file, other files have no references.
+
+    Returns:
+        list[str]: Paths of the referenced assets in the addon content folder, existing or not.
+    """
+    if Path(vmap_file).suffix.lower() != '.vmap' or not os.path.exists(vmap_file): return []
+    try:
+        references = read_asset_references(vmap_file)
+    except DmxError as e:
+        if VERBOSE: print(f'Could not read asset references: {e}')
+        return []
+    return [str(addon.content_path.joinpath(reference)) for reference in references]
+
+# Maps are followed into the other maps they reference, most references are base game assets and are left unresolved
+vmap_dependencies = DependencyGraph(get_vmap_references)
+
+def collect_dependencies(paths:list[str], fingerprint:'PlanFingerprint')->list[str]:
+    """Gets the files a set of assets depend on.
+
+    Maps pull in the assets they reference that exist in the addon and
+    scripts pull in their full require tree, including scripts referenced by maps.
+
+    Args:
+        paths (list[str]): Asset files.
+        fingerprint (PlanFingerprint): Records every file the dependencies were found from.
+
+    Returns:
+        list[str]: Dependency paths not including `paths`.
+    """
+    maps = [path for path in paths if Path(path).suffix.lower() == '.vmap']
+    referenced = vmap_dependencies.closure(maps) if maps else []
+    for file in itertools.chain(maps, referenced):
+        fingerprint.add(file)
+    if maps:
+        for missing in vmap_dependencies.unresolved:
+            fingerprint.add(missing)
+    scripts = [path for path in itertools.chain(paths, referenced) if Path(path).suffix.lower() == '.lua']
+    required = lua_dependencies.closure(scripts) if scripts else []
+    for script in itertools.chain(scripts, required):
+        fingerprint.add(script)
+    if scripts:
+        for missing in lua_dependencies.unresolved:
+            fingerprint.add(missing)
+    return referenced + required
+
 class CMD(Enum):
     NONE          = 0
     CATEGORY      = 1
@@ -132,51 +299,68 @@ class CMD(Enum):
     EXCLUDE_PATH  = 8
     README_TEXT   = 9
 
-def parse_command_line(line:str):
-    """Gets a command and path from a command line.
+# Every command is a whole line, comments must be on their own line
+manifest_tokenizer = Tokenizer([
+    ('comment', r'#[^\n]*'),
+    ('category', r'(?P<arg>[^\n]*):[ \t\r\f\v]*(?=\n|\Z)'),
+    ('append', r'->(?P<arg>[^\n]*)'),
+    ('stop_append', r'<-(?P<arg>)[^\n]*'),
+    ('include', r'&(?P<arg>[^\n]*)'),
+    ('reroute', r'@(?P<arg>[^\n]*)'),
+    ('infer', r'\?(?P<arg>[^\n]*)'),
+    ('remove', r'~(?P<arg>[^\n]*)'),
+    ('exclude', r'\[exclude\](?P<arg>[^\n]*)'),
+    ('readme', r'(?i)\[readme\](?P<arg>[^\n]*)'),
+    ('path', r'(?P<arg>[^\n]+)'),
+], skip=r'\s+')
+
+manifest_commands = {
+    'category': CMD.CATEGORY,
+    'append': CMD.APPEND_PATH,
+    'stop_append': CMD.STOP_APPEND,
+    'include': CMD.INCL_CATEGORY,
+    'reroute': CMD.REROUTE_PATH,
+    'infer': CMD.INFER_PATHS,
+    'remove': CMD.REMOVE_PATHS,
+    'exclude': CMD.EXCLUDE_PATH,
+    'readme': CMD.README_TEXT,
+    'path': CMD.NONE,
+}
+
+class Command:
+    """A single command from release_assets.txt."""
+    def __init__(self, cmd:CMD, arg:str, line:int):
+        """
+        Args:
+            cmd (CMD): The command, CMD.NONE for an asset path.
+            arg (str): Path, name or text given to the command.
+            line (int): Line number the command is on.
+        """
+        self.cmd = cmd
+        self.arg = arg
+        self.line = line
+
+    def __repr__(self) -> str:
+        return f'Command({self.cmd.name}, {self.arg!r}, line {self.line})'
+
+def parse_manifest(src:str)->list[Command]:
+    """Parse the contents of release_assets.txt into a list of commands.
 
     Args:
-        line (str): Command line.
+        src (str): Contents of release_assets.txt.
 
     Returns:
-        CMD: Command found.
-        str: Path.
+        list[Command]: The commands in order.
     """
-    line = line.strip()
-    command:CMD = CMD.NONE
-    if line.endswith(':'):
-        command = CMD.CATEGORY
-        line = line[:-1]
-    elif line.startswith('->'):
-        command = CMD.APPEND_PATH
-        line = line[2:]
-    elif line.startswith('<-'):
-        command = CMD.STOP_APPEND
-        line = ''
-    elif line.startswith('&'):
-        command = CMD.INCL_CATEGORY
-        line = line[1:]
-    elif line.startswith('@'):
-        command = CMD.REROUTE_PATH
-        line = line[1:]
-    elif line.startswith('?'):
-        command = CMD.INFER_PATHS
-        line = line[1:]
-    elif line.startswith('~'):
-        command = CMD.REMOVE_PATHS
-        line = line[1:]
-    elif line.startswith('[exclude]'):
-        command = CMD.EXCLUDE_PATH
-        line = line[9:]
-    elif line.lower().startswith('[readme]'):
-        command = CMD.README_TEXT
-        line = line[8:]
-    
-    line = line.strip()
-    if line.startswith('"'): line = line[1:]
-    if line.endswith('"'): line = line[:-1]
-
-    return command, line
+    commands:list[Command] = []
+    for token in manifest_tokenizer.tokens(src):
+        if token.kind == 'comment':
+            continue
+        arg = token['arg'].strip()
+        if arg.startswith('"'): arg = arg[1:]
+        if arg.endswith('"'): arg = arg[:-1]
+        commands.append(Command(manifest_commands[token.kind], arg, token.line))
+    return commands
 
 
 class Asset:
@@ -217,12 +401,24 @@ class Asset:
         """
         return self.reroute != ''
     
+    @cached_property
+    def key(self)->str:
+        """Canonical path of this asset, resolved once and used for comparing and hashing.
+
+        Returns:
+            str: Canonical path.
+        """
+        return os.path.normcase(os.path.realpath(self.original_path))
+
     def __eq__(self, other):
         if isinstance(other, Asset):
-            other = other.original_path
-        elif not isinstance(other, str):
-            return False
-        return os.path.realpath(self.original_path) == os.path.realpath(other)
+            return self.key == other.key
+        elif isinstance(other, str):
+            return self.key == os.path.normcase(os.path.realpath(other))
+        return False
+
+    def __hash__(self):
+        return hash(self.key)
 
     def __str__(self):
         return str(self.file)
@@ -237,16 +433,27 @@ class Asset:
             return str(self.file)
     
     def clone(self):
-        return Asset(self.original_path, self.reroute)
+        asset = Asset(self.original_path, self.reroute)
+        # Carry over the resolved key so it isn't resolved again
+        if 'key' in self.__dict__:
+            asset.key = self.key
+        return asset
 
 class AssetCategory:
     def __init__(self, name:str, assets:list[Asset]=[]):
         self.name = name
         self.category = name
-        self.assets = list(assets)
+        # Asset key -> asset, keeps insertion order for packing
+        self._assets:dict[str,Asset] = {}
+        for asset in assets:
+            self.add(asset)
 
         self._index = -1
         self._iterlist = []
+
+    @property
+    def assets(self)->list[Asset]:
+        return list(self._assets.values())
     
     def add(self, asset:Asset|str, reroute:str=''):
         """Add a new asset to this category if it doesn't exist.
@@ -257,14 +464,26 @@ class AssetCategory:
         """
         if isinstance(asset, str):
             asset = Asset(asset, reroute)
-        if asset not in self.assets:
-            self.assets.append(asset)
+        if asset.key not in self._assets:
+            self._assets[asset.key] = asset
     
-    def remove_list(self, assets:list[str]):
-        for asset in self.assets:
-            for remove_asset in assets:
-                if remove_asset == asset:
-                    self.assets.remove(asset)
+    def remove_list(self, assets:Iterable[Asset|str])->list[Asset]:
+        """Remove a batch of assets from this category in a single pass.
+
+        Args:
+            assets (Iterable[Asset|str]): Assets or paths to remove. Ones not in the category are ignored.
+
+        Returns:
+            list[Asset]: The assets that were removed.
+        """
+        removed = []
+        for asset in assets:
+            if isinstance(asset, str):
+                asset = Asset(asset)
+            found = self._assets.pop(asset.key, None)
+            if found is not None:
+                removed.append(found)
+        return removed
 
     def extend(self, category:Union['AssetCategory',list[str]]):
         for asset in category:
@@ -282,13 +501,17 @@ class AssetCategory:
         
         removed = []
         for x in self.assets:
-            if not x.exists(): removed.append(x)
-        self.assets[:] = [x for x in self.assets if x.exists()]
+            if not x.exists():
+                removed.append(x)
+                del self._assets[x.key]
         return removed
     
     def __contains__(self, item:Asset|str):
         if isinstance(item, str): item = Asset(item)
-        return item in self.assets
+        return item.key in self._assets
+    
+    def __len__(self):
+        return len(self._assets)
     
     def __iter__(self):
         self._iterlist = list(self.assets)
@@ -307,7 +530,7 @@ class AssetCategory:
         return self.name
     
     def __repr__(self) -> str:
-        return f'AssetCategory({self.name}, {len(self.assets)})'
+        return f'AssetCategory({self.name}, {len(self._assets)})'
 
 class AssetCategories():
     def __init__(self, categories:list[AssetCategory] = []):
@@ -325,12 +548,11 @@ class AssetCategories():
             category.verify()
         
     def all_assets(self) -> list[Asset]:
-        all: list[Asset] = []
+        all: dict[str,Asset] = {}
         for category in self.categories:
             for asset in category.assets:
-                if asset not in all:
-                    all.append(asset)
-        return all
+                all.setdefault(asset.key, asset)
+        return list(all.values())
     
     def __contains__(self, item):
         for category in self.categories:
@@ -358,96 +580,355 @@ class AssetCategories():
 
 readme_text:dict[str,str] = {}
 
+class PlanFingerprint:
+    """The files and folders each line of release_assets.txt was resolved from.
+
+    Paths are stored with their modified time and size at the time they were used
+    so a resolved plan only needs resolving again if one of them has changed.
+    Folders change when files are added to or removed from them.
+    """
+    def __init__(self, lines:dict[str,dict[str,list[int]|None]]|None = None):
+        # Line number -> path -> stat signature
+        self.lines:dict[str,dict[str,list[int]|None]] = lines if lines is not None else {}
+        # Line currently being resolved, paths added are recorded against it
+        self.line = 0
+
+    @staticmethod
+    def signature(path:str)->list[int]|None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def add(self, path:str|Path):
+        paths = self.lines.setdefault(str(self.line), {})
+        path = os.path.abspath(path)
+        if path not in paths:
+            paths[path] = self.signature(path)
+
+    def changed(self)->dict[int,list[str]]:
+        """Get the paths that have changed since they were recorded.
+
+        Returns:
+            dict[int,list[str]]: Changed paths by line number.
+        """
+        changed:dict[int,list[str]] = {}
+        for line, paths in self.lines.items():
+            for path, signature in paths.items():
+                if self.signature(path) != signature:
+                    changed.setdefault(int(line), []).append(path)
+        return changed
+
+# Resolved release_assets.txt from the previous run so unchanged trees aren't searched again
+asset_plan_cache_path = addon.root.joinpath('.assets_cache.json')
+
+def asset_plan_version() -> str:
+    """Gets a hash of everything besides the file system that changes how assets are resolved.
+
+    Returns:
+        str: Resolver hash.
+    """
+    h = hashlib.sha1()
+    h.update(f'{addon.root}|{",".join(lua_funcs)}|{LUA_FULL_PARSE}'.encode())
+    tools_path = Path(addon.__file__).parent
+    for source in (Path(__file__), *(tools_path.joinpath(name) for name in ('addon.py', 'lua.py', 'dmx.py', 'parsing.py', 'util.py'))):
+        h.update(source.read_bytes())
+    return h.hexdigest()
+
+def explain(message:str):
+    if EXPLAIN_PLAN: print(message)
+
+def load_asset_plan(lines:list[str]) -> tuple[AssetCategories,dict[str,list[Asset]],dict[str,list[str]]]|None:
+    """Loads the assets resolved by a previous run if nothing they were resolved from has changed.
+
+    The reason for resolving again is printed when `EXPLAIN_PLAN` is set.
+
+    Args:
+        lines (list[str]): Lines of release_assets.txt.
+
+    Returns:
+        tuple[AssetCategories,dict[str,list[Asset]],dict[str,list[str]]]|None: The categories,
+        assets removed from each category by verifying and scripts that couldn't be found.
+        None if the plan needs resolving again.
+    """
+    if not USE_CACHE:
+        explain('Resolving release_assets.txt because the cache is disabled.')
+        return None
+    try:
+        with open(asset_plan_cache_path, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        explain('Resolving release_assets.txt because there is no cached plan.')
+        return None
+    if cache.get('version') != asset_plan_version():
+        explain('Resolving release_assets.txt because the asset tools have changed.')
+        return None
+
+    old_lines = cache['lines']
+    if old_lines != lines:
+        explain('Resolving release_assets.txt because lines have changed:')
+        for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_lines, lines).get_opcodes():
+            if tag == 'equal': continue
+            for j in range(j1, j2):
+                explain(f'  line {j+1} added: {lines[j].strip()}')
+            for i in range(i1, i2):
+                explain(f'  line {i+1} of previous file removed: {old_lines[i].strip()}')
+        return None
+
+    changed = PlanFingerprint(cache['fingerprint']).changed()
+    if changed:
+        explain('Resolving release_assets.txt because files have changed:')
+        for line, paths in sorted(changed.items()):
+            explain(f'  line {line} ({lines[line-1].strip()}):')
+            for path in paths:
+                explain(f'    {os.path.relpath(path, addon.root)}')
+        return None
+
+    asset_categories = AssetCategories([])
+    removed:dict[str,list[Asset]] = {}
+    for category in cache['categories']:
+        asset_categories.add(AssetCategory(category['name'], [Asset(path, reroute) for path, reroute in category['assets']]))
+        removed[category['name']] = [Asset(path, reroute) for path, reroute in category['removed']]
+    readme_text.update(cache['readme_text'])
+    explain('Loaded release_assets.txt from cache, nothing has changed.')
+    return asset_categories, removed, cache['unresolved']
+
+def load_readme_asset_paths() -> dict[str,list[str]]:
+    """Loads the paths found in READMEs by previous runs, even if the rest of the cached plan is out of date.
+
+    Returns:
+        dict[str,list[str]]: Candidate paths by README hash.
+    """
+    if USE_CACHE:
+        try:
+            with open(asset_plan_cache_path, 'r') as f:
+                cache = json.load(f)
+            if cache.get('version') == asset_plan_version():
+                return cache.get('readmes', {})
+        except (OSError, ValueError):
+            pass
+    return {}
+
+def save_asset_plan(lines:list[str], fingerprint:PlanFingerprint, asset_categories:AssetCategories, removed:dict[str,list[Asset]], unresolved:dict[str,list[str]]):
+    cache = {
+        'version': asset_plan_version(),
+        'lines': lines,
+        'fingerprint': fingerprint.lines,
+        'categories': [
+            {
+                'name': category.name,
+                'assets': [[asset.original_path, asset.reroute] for asset in assets],
+                'removed': [[asset.original_path, asset.reroute] for asset in removed[category.name]],
+            }
+            for category, assets in asset_categories
+        ],
+        'readme_text': readme_text,
+        'unresolved': unresolved,
+        # Only READMEs that are still used are kept
+        'readmes': readme_asset_paths_used,
+    }
+    with open(asset_plan_cache_path, 'w') as f:
+        json.dump(cache, f)
+
+class PlanStep:
+    """A change made to a category, with the category, prefix and reroute of its line already applied."""
+    def __init__(self, cmd:CMD, category:str, arg:str, line:int, reroute:str = '', excluded:int = 0):
+        """
+        Args:
+            cmd (CMD): CMD.NONE to add paths, CMD.REMOVE_PATHS, CMD.INCL_CATEGORY or CMD.INFER_PATHS.
+            category (str): Category being changed.
+            arg (str): Full path pattern, or category name to include.
+            line (int): Line number the step came from.
+            reroute (str, optional): Reroute given to added assets.
+            excluded (int, optional): Number of exclude patterns that come before the step.
+        """
+        self.cmd = cmd
+        self.category = category
+        self.arg = arg
+        self.line = line
+        self.reroute = reroute
+        self.excluded = excluded
+
+class ReleasePlan:
+    """What release_assets.txt asks for, without anything being searched for yet."""
+    def __init__(self):
+        # Category names in the order they are first defined
+        self.categories:list[str] = []
+        self.steps:list[PlanStep] = []
+        # Exclude patterns in order, each step only sees the ones before it
+        self.excluded:list[str] = []
+        self.readme_text:dict[str,str] = {}
+
+def plan_assets(commands:list[Command])->ReleasePlan:
+    """Work out the category, prefix and reroute each command applies to.
+
+    This doesn't touch the file system, commands are only turned into steps.
+
+    Args:
+        commands (list[Command]): Commands from `parse_manifest`.
+
+    Returns:
+        ReleasePlan: The plan.
+    """
+    plan = ReleasePlan()
+    prefix_path = ''
+    reroute_path = ''
+    remove_paths = False
+    current_category_name = 'main'
+
+    plan.categories.append(current_category_name)
+    for command in commands:
+        path = command.arg
+
+        match command.cmd:
+            # Create or set a new category
+            case CMD.CATEGORY:
+                current_category_name = path
+                if not current_category_name in plan.categories:
+                    plan.categories.append(current_category_name)
+                continue
+
+            # Join the given path to the beginning of each subsequent asset
+            case CMD.APPEND_PATH:
+                prefix_path = path
+                continue
+            # Stop prefixing asset paths
+            case CMD.STOP_APPEND:
+                prefix_path = ''
+                continue
+
+            case CMD.INCL_CATEGORY:
+                plan.steps.append(PlanStep(CMD.INCL_CATEGORY, current_category_name, path, command.line))
+                continue
+
+            case CMD.REROUTE_PATH:
+                reroute_path = path
+                continue
+
+            case CMD.INFER_PATHS:
+                plan.steps.append(PlanStep(CMD.INFER_PATHS, current_category_name, path, command.line, excluded=len(plan.excluded)))
+                continue
+
+            case CMD.REMOVE_PATHS:
+                remove_paths = True
+
+            case CMD.EXCLUDE_PATH:
+                plan.excluded.append(path)
+                continue
+
+            case CMD.README_TEXT:
+                if not current_category_name in plan.readme_text:
+                    plan.readme_text[current_category_name] = ''
+                if plan.readme_text[current_category_name] != '': plan.readme_text[current_category_name] += '\n'
+                plan.readme_text[current_category_name] += decode_escapes(path)
+                continue
+
+        # Asset line
+
+        if prefix_path != '':
+            path = os.path.join(prefix_path, path)
+
+        cmd = CMD.REMOVE_PATHS if remove_paths else CMD.NONE
+        plan.steps.append(PlanStep(cmd, current_category_name, path, command.line, reroute_path, len(plan.excluded)))
+        remove_paths = False
+
+    return plan
+
+def resolve_assets(plan:ReleasePlan, fingerprint:PlanFingerprint) -> AssetCategories:
+    """Resolve a plan into categories of assets.
+
+    Every search in the plan is done first in one pass, each unique pattern only once.
+    The categories are then built from the results without touching the file system.
+
+    Args:
+        plan (ReleasePlan): Plan from `plan_assets`.
+        fingerprint (PlanFingerprint): Records the files and folders each line was resolved from.
+
+    Returns:
+        AssetCategories: The categories.
+    """
+    # Search results by number of exclude patterns in effect and path pattern
+    found:dict[tuple[int,str],list[str]] = {}
+    required:dict[tuple[int,str],list[str]] = {}
+    inferred:dict[tuple[int,str],list[str]] = {}
+
+    excluded = 0
+    for step in sorted(plan.steps, key=lambda step: step.excluded):
+        # Exclude patterns only apply to searches after them
+        if step.excluded > excluded:
+            addon.exclude_content_files(plan.excluded[excluded:step.excluded])
+            excluded = step.excluded
+        key = (step.excluded, step.arg)
+        fingerprint.line = step.line
+        if step.cmd == CMD.INFER_PATHS and key not in inferred:
+            pattern = os.path.join(step.arg, '*.md')
+            for searched in addon.searched_content_paths(pattern):
+                fingerprint.add(searched)
+            inferred[key] = []
+            for file in addon.find_content_files(pattern):
+                fingerprint.add(file)
+                inferred[key].extend(parse_readme(file, fingerprint))
+            inferred[key].extend(collect_dependencies(inferred[key], fingerprint))
+        elif step.cmd in (CMD.NONE, CMD.REMOVE_PATHS) and key not in found:
+            for searched in addon.searched_content_paths(step.arg):
+                fingerprint.add(searched)
+            found[key] = addon.find_content_files(step.arg)
+        if step.cmd == CMD.NONE and key not in required:
+            required[key] = collect_dependencies(found[key], fingerprint)
+    if excluded < len(plan.excluded):
+        addon.exclude_content_files(plan.excluded[excluded:])
+
+    asset_categories = AssetCategories([AssetCategory(name) for name in plan.categories])
+    for step in plan.steps:
+        key = (step.excluded, step.arg)
+        category = asset_categories[step.category]
+        match step.cmd:
+            case CMD.INCL_CATEGORY:
+                category.extend(asset_categories[step.arg])
+            case CMD.INFER_PATHS:
+                category.extend(inferred[key])
+            case CMD.REMOVE_PATHS:
+                removed = category.remove_list(found[key])
+                if VERBOSE: print(f'Removed {len(removed)} assets from {step.category} matching "{step.arg}"')
+            case CMD.NONE:
+                category.extend([Asset(x, step.reroute) for x in found[key]] + [Asset(x) for x in required[key]])
+
+    readme_text.update(plan.readme_text)
+    return asset_categories
+
 def parse_assets():
     """Parse the release_assets.txt file in the same folder and return the asset paths.
 
+    The resolved assets are cached and reused until release_assets.txt or
+    any file or folder it was resolved from changes.
+
     Returns:
-        list[str]: The assets.
+        AssetCategories: The assets.
     """
-    asset_categories = AssetCategories()
     with open('release_assets.txt', 'r') as file:
-        prefix_path = ''
-        reroute_path = ''
-        remove_paths = False
-        current_category_name = 'main'
-
-        asset_categories.add(current_category_name)
-        for line in file:
-            # Skip comments and empty
-            if line.isspace() or line.lstrip().startswith('#'): continue
-
-            cmd, path = parse_command_line(line)
-
-            match cmd:
-                case CMD.NONE:
-                    pass
-                
-                # Create or set a new category
-                case CMD.CATEGORY:
-                    current_category_name = path
-                    if not current_category_name in asset_categories:
-                        asset_categories.add(current_category_name)
-                    continue
-
-                # Join the given path to the beginning of each subsequent asset
-                case CMD.APPEND_PATH:
-                    prefix_path = path
-                    continue
-                # Stop prefixing asset paths
-                case CMD.STOP_APPEND:
-                    prefix_path = ''
-                    continue
-
-                case CMD.INCL_CATEGORY:
-                    asset_categories[current_category_name].extend(asset_categories[path])
-                    continue
-
-                case CMD.REROUTE_PATH:
-                    reroute_path = path
-                    continue
-
-                case CMD.INFER_PATHS:
-                    for file in addon.find_content_files(os.path.join(path, '*.md')):
-                        asset_categories[current_category_name].extend(parse_readme(file))
-                    continue
-
-                case CMD.REMOVE_PATHS:
-                    remove_paths = True
-                
-                case CMD.EXCLUDE_PATH:
-                    addon.exclude_content_files(path)
-                    continue
-                
-                case CMD.README_TEXT:
-                    if not current_category_name in readme_text:
-                        readme_text[current_category_name] = ''
-                    if readme_text[current_category_name] != '': readme_text[current_category_name] += '\n'
-                    readme_text[current_category_name] += decode_escapes(path)
-                    continue
-
-
-            # Asset line
-
-            if prefix_path != '':
-                path = os.path.join(prefix_path, path)
-
-            new_assets = [Asset(x, reroute_path) for x in addon.find_content_files(path)]
-            
-            if remove_paths:
-                asset_categories[current_category_name].remove_list(new_assets)
-                remove_paths = False
-            else:
-                new_scripts = []
-                for asset in new_assets:
-                    if asset.file.suffix.lower() == '.lua':
-                        new_scripts.extend([Asset(x) for x in get_required_from_lua(asset.original_path)])
-                new_assets.extend(new_scripts)
-                asset_categories[current_category_name].extend(new_assets)
+        lines = file.readlines()
+
+    cached = load_asset_plan(lines)
+    if cached is not None:
+        asset_categories, removed, unresolved = cached
+    else:
+        fingerprint = PlanFingerprint()
+        asset_categories = resolve_assets(plan_assets(parse_manifest(''.join(lines))), fingerprint)
+        save_lua_cache()
+        removed = {category.name: category.verify() for category, _ in asset_categories}
+        unresolved = lua_dependencies.unresolved
+        if not PRINT_ONLY:
+            save_asset_plan(lines, fingerprint, asset_categories, removed, unresolved)
+
+    if VERBOSE and unresolved:
+        print('Required scripts that could not be found:')
+        for missing, required_by in unresolved.items():
+            print(f'  {missing} (required by {", ".join(os.path.relpath(x, addon.root) for x in required_by)})')
+        print()
 
     if VERBOSE: print('Assets collected from release_assets.txt:')
     for category, assets in asset_categories:
-        removed = category.verify()
-
         if VERBOSE:
             print()
             print(f'  {category}:')
@@ -458,99 +939,337 @@ def parse_assets():
             for asset in assets:
                 print(f'      {asset.pretty()}')
             print('    removed:')
-            print_list(removed, '      ')
+            print_list(removed[category.name], '      ')
             
     return asset_categories
 
 #endregion Parsing
 
-def zip_files(assets: 'list[Asset]', output_path: Path):
+# Strong hash stored for every file in release manifests
+manifest_hash = 'sha256'
+# Hash upload backends compare files by, also stored in manifests so uploading doesn't read every file again
+upload_hash = 'md5'
+
+def manifest_digests(data: bytes) -> dict[str, str]:
+    """Gets the hashes stored in release manifests for some file contents.
+
+    Args:
+        data (bytes): File contents.
+
+    Returns:
+        dict[str, str]: Hex digests by hash name.
+    """
+    return {name: hashlib.new(name, data).hexdigest() for name in (manifest_hash, upload_hash)}
+
+def manifest_source(asset: Asset) -> str:
+    """Gets the path of an asset's source file as it is written in release manifests.
+
+    Args:
+        asset (Asset): The asset.
+
+    Returns:
+        str: Path relative to the addon root using forward slashes.
+    """
+    return os.path.relpath(asset.file, addon.root).replace(os.sep, '/')
+
+def prepare_zip_entry(asset: Asset, previous: dict[str, ZipInfo]) -> tuple[ZipInfo, bytes|None, bytes|None, dict[str, str]]:
+    """Reads and compresses an asset ready to be written to a zip.
+
+    Args:
+        asset (Asset): The asset.
+        previous (dict[str, ZipInfo]): Entries of the previous zip by name.
+
+    Returns:
+        tuple[ZipInfo, bytes|None, bytes|None, dict[str, str]]: The zip entry, its data, its compressed data and the hashes of its contents.
+        The data is None if the previous entry is unchanged and can be copied.
+        The compressed data is None if it can't be written as is, see `raw_writes`.
+    """
+    arcname = os.path.relpath(asset.get_path(), addon.root).replace(os.sep, '/')
+    with open(asset.file, 'rb') as f:
+        data = f.read()
+    digests = manifest_digests(data)
+    old = previous.get(arcname)
+    if old is not None and old.file_size == len(data) and old.compress_type == ZIP_COMPRESSION and old.CRC == zlib.crc32(data):
+        return old, None, None, digests
+    zinfo = ZipInfo.from_file(asset.file, arcname)
+    zinfo.compress_type = ZIP_COMPRESSION
+    return zinfo, data, compress(zinfo, data, ZIP_COMPRESS_LEVEL) if raw_writes else None, digests
+
+def zip_files(assets: 'list[Asset]', output_path: Path, readme: str|None = None, previous_path: Path|None = None) -> dict[str, dict]:
     """Zips a list of files to a given output zip file.
 
+    Files are compressed on up to `ZIP_JOBS` threads, a few per thread ahead of the writer,
+    and written in order in a single pass.
+    Entries that haven't changed since the previous zip are copied from it without recompressing.
+
     Args:
         files (list[Path]): The files to zip.
         output_path (Path): The destination for the zip file.
+        readme (str, optional): Text written to a readme.txt in the zip.
+        previous_path (Path, optional): The previous release of this zip, must not be `output_path`.
+
+    Returns:
+        dict[str, dict]: Manifest of the zip, see `save_manifest`.
     """
-    with ZipFile( output_path , 'w' ) as zip_obj:
-        for asset in assets:
-            if asset.exists():
-                zip_obj.write( asset.file, os.path.relpath(asset.get_path(), addon.root) )
-            else:
-                print(f'{asset} File Doesn\'t Exist:', asset)
+    existing = []
+    for asset in assets:
+        if asset.exists():
+            existing.append(asset)
+        else:
+            print(f'{asset} File Doesn\'t Exist:', asset)
+
+    previous_zip = None
+    previous_fp = None
+    previous: dict[str, ZipInfo] = {}
+    if previous_path is not None and previous_path.exists():
+        previous_zip = ZipFile(previous_path, 'r')
+        # Unchanged entries are read raw through their own handle instead of ZipFile's
+        previous_fp = open(previous_path, 'rb')
+        previous = {info.filename: info for info in previous_zip.infolist()}
+
+    manifest: dict[str, dict] = {}
+    reused = 0
+    def add_to_manifest(zinfo: ZipInfo, source: str|None, digests: dict[str, str]):
+        manifest[zinfo.filename] = {
+            'source': source,
+            'size': zinfo.file_size,
+            'crc': zinfo.CRC,
+            **digests,
+        }
+
+    try:
+        with ZipFile( output_path , 'w', ZIP_COMPRESSION ) as zip_obj:
+            with ThreadPoolExecutor(max_workers=ZIP_JOBS) as executor:
+                for asset, (zinfo, data, compressed, digests) in bounded_map(executor, prepare_zip_entry, existing, previous, ahead=ZIP_JOBS * 4):
+                    if data is None:
+                        copy_entry(previous_zip, previous_fp, zinfo, zip_obj, ZIP_COMPRESS_LEVEL)
+                        reused += 1
+                    else:
+                        write_entry(zip_obj, zinfo, data, compressed, ZIP_COMPRESS_LEVEL)
+                    add_to_manifest(zinfo, manifest_source(asset), digests)
+            if readme is not None:
+                data = readme.encode('utf-8')
+                old = previous.get('readme.txt')
+                if old is not None and old.file_size == len(data) and old.compress_type == ZIP_COMPRESSION and old.CRC == zlib.crc32(data):
+                    copy_entry(previous_zip, previous_fp, old, zip_obj, ZIP_COMPRESS_LEVEL)
+                    zinfo = old
+                    reused += 1
+                else:
+                    zinfo = ZipInfo('readme.txt', date_time=time.localtime(time.time())[:6])
+                    zinfo.compress_type = ZIP_COMPRESSION
+                    write_entry(zip_obj, zinfo, data, compress(zinfo, data, ZIP_COMPRESS_LEVEL) if raw_writes else None, ZIP_COMPRESS_LEVEL)
+                add_to_manifest(zinfo, None, manifest_digests(data))
+    finally:
+        if previous_zip is not None:
+            previous_zip.close()
+            previous_fp.close()
+
+    if VERBOSE: print(f' Reused {reused} unchanged entries...', end='')
+
+    return manifest
+
+def load_manifest(manifest_path: Path, zip_path: Path) -> dict[str, dict]:
+    """Loads the manifest of a previous release.
+
+    Releases packed before manifests existed have one built from their zip instead.
+
+    Args:
+        manifest_path (Path): The manifest file.
+        zip_path (Path): The zip the manifest belongs to.
+
+    Returns:
+        dict[str, dict]: Entries by name, empty if there is no previous release.
+    """
+    if manifest_path.exists():
+        try:
+            with open(manifest_path, 'r') as f:
+                return json.load(f)['files']
+        except (OSError, ValueError, KeyError):
+            pass
+    if zip_path.exists():
+        with ZipFile(zip_path, 'r') as zip_obj:
+            return {info.filename: {'crc': info.CRC, 'size': info.file_size} for info in zip_obj.infolist()}
+    return {}
+
+def manifest_compression() -> dict:
+    """Gets the compression settings the current release is packed with, as written in manifests."""
+    return {'method': ZIP_COMPRESSION, 'level': ZIP_COMPRESS_LEVEL}
+
+def load_manifest_compression(manifest_path: Path) -> dict|None:
+    """Loads the compression settings a previous release was packed with.
+
+    Args:
+        manifest_path (Path): The manifest file.
+
+    Returns:
+        dict|None: Settings from `manifest_compression`, None if they weren't recorded.
+    """
+    try:
+        with open(manifest_path, 'r') as f:
+            return json.load(f).get('compression')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def save_manifest(manifest_path: Path, manifest: dict[str, dict]):
+    """Saves the manifest of a release.
+
+    Each file is listed by its path in the release with the path of its source file,
+    its size, CRC32 and `manifest_hash` so releases can be compared without opening them,
+    and its `upload_hash` so uploads can be compared without reading the source again.
+    The compression settings are saved too so entries are only reused from a zip packed the same way.
+
+    Args:
+        manifest_path (Path): The manifest file.
+        manifest (dict[str, dict]): Entries by name.
+    """
+    with open(manifest_path, 'w') as f:
+        json.dump({'hash': manifest_hash, 'compression': manifest_compression(), 'files': manifest}, f, indent=1)
+
+def load_upload_hashes(manifest_folder: Path) -> dict[str, str]:
+    """Gets the `upload_hash` of every source file packed into a release, from its manifests.
+
+    A hash is only used if the source file hasn't changed size and wasn't modified after
+    the manifest was saved, anything else is hashed again when uploading.
+
+    Args:
+        manifest_folder (Path): Folder the release manifests are saved in.
+
+    Returns:
+        dict[str, str]: Hashes by source path, as written by `manifest_source`.
+    """
+    hashes: dict[str, str] = {}
+    for manifest_path in manifest_folder.glob('*.manifest.json'):
+        try:
+            saved = os.stat(manifest_path).st_mtime_ns
+            with open(manifest_path, 'r') as f:
+                entries = json.load(f)['files']
+        except (OSError, ValueError, KeyError):
+            continue
+        for entry in entries.values():
+            source = entry.get('source')
+            if source is None or upload_hash not in entry or source in hashes:
+                continue
+            try:
+                stat = os.stat(addon.root.joinpath(source))
+            except OSError:
+                continue
+            if stat.st_size == entry['size'] and stat.st_mtime_ns <= saved:
+                hashes[source] = entry[upload_hash]
+    return hashes
+
+def same_contents(a: dict, b: dict) -> bool:
+    """Gets if two manifest entries have the same contents.
+
+    The strong hash is used when both entries have one, entries built from
+    an old zip only have their CRC32 and size to go by.
+    """
+    if manifest_hash in a and manifest_hash in b:
+        return a[manifest_hash] == b[manifest_hash]
+    return a['crc'] == b['crc'] and a['size'] == b['size']
 
-def compare_zips(new_zip: Path, old_zip: Path|None) -> 'list[str]':
-    """Compares two zip files and returns a readable log of changes to the files.
+def compare_manifests(new: dict[str, dict], old: dict[str, dict]) -> 'list[str]':
+    """Compares two release manifests and returns a readable log of changes to the files.
+
+    Files that disappeared from one path and appeared with the same contents at another are logged as moved.
 
     Args:
-        new_zip (Path): The new zip that might have changes to it.
-        old_zip (Path): The old zip of similar structure.
+        new (dict[str, dict]): Manifest of the new release.
+        old (dict[str, dict]): Manifest of the previous release.
 
     Returns:
         list[str]: List of changes.
     """
     log = []
-    new_assets = {}
-    old_assets = {}
-    with ZipFile(new_zip, 'r') as zip_obj:
-        for info in zip_obj.infolist():
-            new_assets[info.filename] = {
-                'crc': info.CRC
-            }
-    if old_zip is not None and os.path.exists(old_zip):
-        with ZipFile(old_zip, 'r') as zip_obj:
-            for info in zip_obj.infolist():
-                old_assets[info.filename] = {
-                    'crc': info.CRC
-                }
-
-    for asset in new_assets:
-        # If this asset is in the old assets then it might be updated
-        if asset in old_assets:
-            # If CRC is different then it was updated
-            crc = new_assets[asset]['crc']
-            if crc != old_assets[asset]['crc']:
-                log.append(f'Updated {asset}')
-                #print(f'Updated {asset}', crc, old_assets[asset]['crc'])
-            else:
-                #print(f'No change for {asset}')
-                pass
-            # Remove from old_assets so we end up with any assets deleted
-            old_assets.pop(asset)
+    # Deleted files by CRC32 and size, so created files with the same contents are known to be moved
+    deleted: dict[tuple, list[str]] = {}
+    for name, entry in old.items():
+        if name not in new:
+            deleted.setdefault((entry['crc'], entry['size']), []).append(name)
+
+    for name, entry in new.items():
+        if name in old:
+            if not same_contents(entry, old[name]):
+                log.append(f'Updated {name}')
+            continue
+        candidates = deleted.get((entry['crc'], entry['size']), [])
+        moved_from = next((old_name for old_name in candidates if same_contents(entry, old[old_name])), None)
+        if moved_from is not None:
+            candidates.remove(moved_from)
+            log.append(f'Moved {moved_from} to {name}')
         else:
-            log.append(f'Created {asset}')
-            #print(f'Created {asset}')
-    
-    for asset in old_assets:
-        log.append(f'Deleted {asset}')
-        #print(f'Deleted {asset}')
-    
-    # Remove duplicates and sort
-    log = list(set(log))
-    log.sort()
+            log.append(f'Created {name}')
+
+    for names in deleted.values():
+        for name in names:
+            log.append(f'Deleted {name}')
 
+    log.sort()
     return log
 
 def copy_unpacked_files(assets: 'list[Asset]'):
-    """Copies all assets into an unpacked folder in the release directory
+    """Syncs all assets into an unpacked folder in the release directory
     instead of zipping them.
 
+    Only files that changed since the last sync are copied and files that
+    are no longer assets are removed, everything else is left in place.
+
     Args:
         assets (list[Path]): The assets to copy.
     """
-    # print(f'Copying {len(assets)} assets.')
     unpacked_path = release_path.joinpath('unpacked/')
-    if not PRINT_ONLY:
-        if unpacked_path.exists():
-            shutil.rmtree(unpacked_path)
-    if VERBOSE: print('')
+
+    targets: dict[Path, Asset] = {}
     for asset in assets:
-        rel = os.path.relpath(asset.get_path(), addon.root)
-        p = unpacked_path.joinpath(rel).parent
-        if VERBOSE: print(f'  Copying unpacked file {asset.file.name} to {os.path.relpath(p, addon.root)}')
+        targets[unpacked_path.joinpath(os.path.relpath(asset.get_path(), addon.root))] = asset
+
+    stale: list[Path] = []
+    if unpacked_path.exists():
+        for root, dirs, files in os.walk(unpacked_path):
+            for file in files:
+                path = Path(root, file)
+                if path not in targets:
+                    stale.append(path)
+
+    if VERBOSE: print('')
+
+    for path in stale:
+        if VERBOSE: print(f'  Removing unpacked file {os.path.relpath(path, addon.root)}')
         if not PRINT_ONLY:
-            p.mkdir(parents=True, exist_ok=True)
-            shutil.copy(asset.file, p )
-            pass
+            os.remove(path)
+
+    if not PRINT_ONLY:
+        # Each folder is only created once instead of once per file
+        for folder in sorted({target.parent for target in targets}):
+            folder.mkdir(parents=True, exist_ok=True)
+
+    def sync_file(target: Path, asset: Asset) -> bool:
+        if is_up_to_date(asset.file, target, check_hash=not USE_CACHE):
+            return False
+        if not PRINT_ONLY:
+            place_file(asset.file, target, COPY_MODE)
+        return True
+
+    copied = 0
+    copied_bytes = 0
+    start_time = time.perf_counter()
+    # Copying is mostly waiting on the disk so files are copied on several threads at once
+    with ThreadPoolExecutor(max_workers=COPY_JOBS) as executor:
+        for (target, asset), changed in zip(targets.items(), executor.map(sync_file, targets.keys(), targets.values())):
+            if not changed:
+                continue
+            copied += 1
+            copied_bytes += asset.file.stat().st_size
+            if VERBOSE: print(f'  Copying unpacked file {asset.file.name} to {os.path.relpath(target.parent, addon.root)}')
+    elapsed = max(time.perf_counter() - start_time, 1e-9)
+
+    if not PRINT_ONLY and unpacked_path.exists():
+        # Folders emptied by removed files
+        for root, dirs, files in os.walk(unpacked_path, topdown=False):
+            if root != str(unpacked_path) and not os.listdir(root):
+                os.rmdir(root)
+
+    print(f' {copied} copied, {len(stale)} removed, {len(targets) - copied} unchanged...', end='')
+    if copied: print(f' {copied_bytes / elapsed / 1e6:.1f} MB/s, {copied / elapsed:.0f} files/s...', end='')
 
 def generate_releases(asset_categories:AssetCategories):
     changelog:list[str] = []
@@ -567,34 +1286,24 @@ def generate_releases(asset_categories:AssetCategories):
             print(f'Category "{category}" has no assets, skipping...')
             continue
 
-        print(f'Preparing category "{category}"...', end='')
-
         output = release_path.joinpath(f'{category}.zip')
-
-        # Create backup of previous release
-        old = None
-        if output.exists():
-            old = output.with_suffix(output.suffix + '.old')
-            print(f' Renaming previous {category} release for comparing...',end='')
-            if not PRINT_ONLY:
-                if old.exists():
-                    os.remove(old)
-                os.rename(output, old)
-        print(' DONE.')
         
-        print(f'Packing {len(assets)} assets...', end='')
+        print(f'Packing {len(assets)} assets for category "{category}"...', end='')
         if not PRINT_ONLY:
-            zip_files(assets, output)
-            if category.name in readme_text:
-                with ZipFile( output , 'a' ) as zip_obj:
-                    zip_obj.writestr('readme.txt', readme_text[category.name])
-        print(' DONE')
-
-        # Compare changes
-        if not PRINT_ONLY:
-            print('Comparing zips...', end='')
-            # if old is not None:
-            log = compare_zips(output, old)
+            manifest_path = release_path.joinpath(f'{category}.manifest.json')
+            previous_manifest = load_manifest(manifest_path, output)
+            # Unchanged entries are only copied from a release packed with the same method and level
+            previous = output if load_manifest_compression(manifest_path) == manifest_compression() else None
+            # Written next to the previous release so unchanged entries can be copied from it
+            temp = output.with_suffix(output.suffix + '.tmp')
+            try:
+                manifest = zip_files(assets, temp, readme_text.get(category.name), previous)
+                os.replace(temp, output)
+            finally:
+                if temp.exists():
+                    temp.unlink()
+            save_manifest(manifest_path, manifest)
+            log = compare_manifests(manifest, previous_manifest)
             changes += len(log)
             if len(log) > 0:
                 changelog.append(f'**{category}.zip**')
@@ -602,17 +1311,8 @@ def generate_releases(asset_categories:AssetCategories):
                     changelog.append('- ' + message)
                 changelog.append('')
             print(f' Found {len(log)} changes.')
-            # else:
-                # print(' No previous zip to compare to.')
-
-        # Clean up
-        if not PRINT_ONLY:
-            print('Deleting old zip...', end='')
-            if old is not None:
-                os.remove(old)
-                print(' DONE.')
-            else:
-                print(' No old zip to delete.')
+        else:
+            print(' DONE')
     
     print()
 
@@ -646,7 +1346,64 @@ readme_paths = [
     'scripts/vscripts/util',
 ]
 
+# Rendered Lua docs from previous runs so unchanged scripts aren't parsed again
+readme_cache_path = addon.root.joinpath('.readme_cache.json')
+
+def readme_generator_version() -> str:
+    """Gets a hash of the doc generator source so cached docs are discarded when it changes.
+
+    This file is included because the READMEs are put together from the docs here.
+
+    Returns:
+        str: Generator hash.
+    """
+    h = hashlib.sha1()
+    tools_path = Path(luadoc.__file__).parent
+    for source in (Path(__file__), tools_path.joinpath('lua_doc_to_html.py'), tools_path.joinpath('lib/parsing.py')):
+        h.update(source.read_bytes())
+    return h.hexdigest()
+
+def load_readme_cache() -> dict:
+    """Loads the readme cache, or an empty one if it doesn't exist or is out of date.
+
+    Returns:
+        dict: The cache with 'version', 'files' and 'folders' keys.
+    """
+    version = readme_generator_version()
+    if USE_CACHE and readme_cache_path.exists():
+        try:
+            with open(readme_cache_path, 'r') as f:
+                cache = json.load(f)
+            if cache.get('version') == version:
+                return cache
+        except (OSError, ValueError):
+            pass
+    return {'version': version, 'files': {}, 'folders': {}}
+
+def save_readme_cache(cache: dict):
+    with open(readme_cache_path, 'w') as f:
+        json.dump(cache, f)
+
+def render_lua_docs(luas: list[str]) -> list[str]:
+    """Renders the docs for a list of Lua files, in parallel if more than one job is allowed.
+
+    Args:
+        luas (list[str]): Lua files to render.
+
+    Returns:
+        list[str]: Rendered docs in the same order as `luas`.
+    """
+    if JOBS == 1 or len(luas) < 2:
+        return [luadoc.lua_file_to_html(lua) for lua in luas]
+    with ProcessPoolExecutor(max_workers=min(JOBS, len(luas))) as executor:
+        return list(executor.map(luadoc.lua_file_to_html, luas))
+
 def generate_script_readmes():
+    cache = load_readme_cache()
+    # Only entries seen this run are kept so removed scripts don't linger
+    files_cache = {}
+    folders_cache = {}
+    folders:list[tuple[Path,list[list[str]]]] = []
     for path in readme_paths:
         if USE_TEST_RELEASE:
             output = addon.root.joinpath('test_release/readmes',path,'README.md')
@@ -655,32 +1412,44 @@ def generate_script_readmes():
         luas = [f for f in glob(os.path.join(path,'*.lua')) if not os.path.basename(f).startswith('__test')]
         luas.sort()
         if len(luas) > 0:
-            print(f'Generating readme in "{os.path.relpath(output.parent, addon.root)}" for {len(luas)} Lua files... ', end='')
-            doc = ''
-            prev_doc = ''
-            for lua in luas:
-                doc += f'---\n\n{luadoc.lua_file_to_html(lua)}\n\n'
-            if os.path.exists(output):
-                with open(output, 'r') as f:
-                    prev_doc = f.readlines()
-            if not ''.join(prev_doc[2:]) == doc:
-                with open(output, 'w') as f:
-                    index = "## Index\n" + "\n".join(f"{i}. [{os.path.basename(lua)}](#{os.path.basename(lua).replace('.','')})" for i, lua in enumerate(luas, 1))
-                    f.write(f'> Last Updated {datetime.datetime.now().strftime("%Y-%m-%d")}\n\n{index}\n\n{doc}')
-                print('DONE')
-            else:
-                print('NO CHANGES')
-
-def file_mimetype(file) -> str:
-    match os.path.splitext(file)[1]:
-        case '.fgd'|'.lua'|'.md'|'.py'|'.gitignore'|'.gitattributes'|'.bat'|'.yaml':
-            return 'text/plain'
-        case '.json'|'.code-snippets'|'.vrman'|'.vsndevts'|'.vmdl'|'.vmat'|'.rect':
-            return 'text/plain'
-        case _:
-            return None
-            # This is invalid apparently
-            # return 'application/vnd.google-apps.unknown'
+            hashes = [[lua, file_hash(lua)] for lua in luas]
+            for lua, h in hashes:
+                if lua in cache['files'] and cache['files'][lua]['hash'] == h:
+                    files_cache[lua] = cache['files'][lua]
+            folder_key = str(output)
+            folders_cache[folder_key] = hashes
+            # Readme was generated from these exact files last time
+            if cache['folders'].get(folder_key) == hashes and output.exists():
+                print(f'Generating readme in "{os.path.relpath(output.parent, addon.root)}" for {len(luas)} Lua files... NO CHANGES')
+                continue
+            folders.append((output, hashes))
+
+    # Every changed script is rendered in one batch so they can be spread across jobs
+    pending = [(lua, h) for _, hashes in folders for lua, h in hashes if lua not in files_cache]
+    for (lua, h), html in zip(pending, render_lua_docs([lua for lua, _ in pending])):
+        files_cache[lua] = {'hash': h, 'html': html}
+
+    for output, hashes in folders:
+        luas = [lua for lua, _ in hashes]
+        print(f'Generating readme in "{os.path.relpath(output.parent, addon.root)}" for {len(luas)} Lua files... ', end='')
+        doc = ''
+        prev_doc = ''
+        for lua in luas:
+            doc += f'---\n\n{files_cache[lua]["html"]}\n\n'
+        index = "## Index\n" + "\n".join(f"{i}. [{os.path.basename(lua)}](#{os.path.basename(lua).replace('.','')})" for i, lua in enumerate(luas, 1))
+        if os.path.exists(output):
+            with open(output, 'r') as f:
+                prev_doc = f.readlines()
+        if not ''.join(prev_doc[2:]) == f'{index}\n\n{doc}':
+            output.parent.mkdir(parents=True, exist_ok=True)
+            with open(output, 'w') as f:
+                f.write(f'> Last Updated {datetime.datetime.now().strftime("%Y-%m-%d")}\n\n{index}\n\n{doc}')
+            print('DONE')
+        else:
+            print('NO CHANGES')
+    cache['files'] = files_cache
+    cache['folders'] = folders_cache
+    save_readme_cache(cache)
 
 if __name__ == '__main__':
 
@@ -697,6 +1466,18 @@ if __name__ == '__main__':
         parser.add_argument('--testrelease', action='store_true', help='files will be generated in test_release folder')
         parser.add_argument('--pause', action='store_true', help='wait for input after finishing')
         parser.add_argument('--upload', action='store_true', help='upload assets to google drive')
+        parser.add_argument('--uploadto', metavar='PATH', default=None, help='upload assets into a local folder instead of google drive, for testing uploads offline. Implies --upload')
+        parser.add_argument('--uploadfailafter', type=int, default=None, metavar='N', help='make the --uploadto folder fail once after N requests, for testing retries and resuming')
+        parser.add_argument('--uploadjobs', type=int, default=4, metavar='N', help='number of files uploaded at once')
+        parser.add_argument('--nocache', action='store_true', help='ignore cached results from previous runs')
+        parser.add_argument('--explain', action='store_true', help='print why release_assets.txt had to be resolved again instead of loaded from cache')
+        parser.add_argument('--luaparser', action='store_true', help='always use the full Lua parser to find required scripts')
+        parser.add_argument('--jobs', type=int, default=1, metavar='N', help='number of parallel jobs used to generate readmes, 0 uses all cores')
+        parser.add_argument('--zipjobs', type=int, default=0, metavar='N', help='number of zip entries compressed at once, 0 uses all cores')
+        parser.add_argument('--copyjobs', type=int, default=0, metavar='N', help='number of unpacked files copied at once, 0 picks a number suited to disk work')
+        parser.add_argument('--compression', choices=compression_methods.keys(), default='deflated', help='compression method used for zips')
+        parser.add_argument('--level', type=int, default=None, help='compression level used for zips, defaults to the method default')
+        parser.add_argument('--copymode', choices=copy_modes, default='copy', help='how unpacked assets are placed in the release folder, links fall back to copying when unsupported')
 
         args = parser.parse_args()
 
@@ -715,7 +1496,30 @@ if __name__ == '__main__':
         # Console won't exit immediately
         PAUSE_AT_END = args.pause
         # BACKUP_PREVIOUS_RELEASES = False
-        UPLOAD_TO_DRIVE = args.upload
+        UPLOAD_TO_DRIVE = args.upload or args.uploadto is not None
+        # Local folder standing in for google drive
+        UPLOAD_PATH = args.uploadto
+        # Number of requests before the local upload folder fails once
+        UPLOAD_FAIL_AFTER = args.uploadfailafter
+        # Number of files uploaded at once
+        UPLOAD_JOBS = max(args.uploadjobs, 1)
+        # Results from previous runs are reused for unchanged files
+        USE_CACHE = not args.nocache
+        # Reasons for resolving release_assets.txt again are printed
+        EXPLAIN_PLAN = args.explain
+        # Required scripts are found with the full Lua parser instead of scanning
+        LUA_FULL_PARSE = args.luaparser
+        # Number of processes for CPU heavy work
+        JOBS = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+        # Number of threads compressing zip entries, the compressors release the GIL so this scales with cores
+        ZIP_JOBS = args.zipjobs if args.zipjobs > 0 else (os.cpu_count() or 1)
+        # Number of threads for disk heavy work, which is mostly waiting so isn't bound by cores
+        COPY_JOBS = args.copyjobs if args.copyjobs > 0 else min(32, (os.cpu_count() or 1) + 4)
+        # How zip entries are compressed
+        ZIP_COMPRESSION = compression_methods[args.compression]
+        ZIP_COMPRESS_LEVEL = args.level
+        # How unpacked assets are copied
+        COPY_MODE = args.copymode
 
         # UPLOAD_TO_DRIVE = True
         # VERBOSE = True
@@ -759,71 +1563,40 @@ if __name__ == '__main__':
                 print(' DONE.')
 
             if UPLOAD_TO_DRIVE:
+                if UPLOAD_PATH is not None:
+                    backend = LocalBackend(UPLOAD_PATH, fail_after=UPLOAD_FAIL_AFTER)
+                else:
+                    backend = DriveBackend(drive_folder_id)
+                files = [(asset.file, PurePosixPath(asset.relative_to(addon.root).as_posix())) for asset in all]
                 error_count = 0
                 while True:
                     try:
-                        print(f'\nUploading {len(all)} assets to google drive... ', end='')
+                        print(f'\nUploading {len(all)} assets to {UPLOAD_PATH or "google drive"}... ', end='')
                         upload_time_start = time.time()
-                        gauth = GoogleAuth()
-                        if gauth.credentials is None:
-                            print('Google Drive waiting for authorization...')
-                            gauth.LocalWebserverAuth()
-                        elif gauth.access_token_expired:
-                            print('Google Drive token expired, refreshing...')
-                            gauth.Refresh()
-                        else:
-                            gauth.Authorize()
-                        gauth.SaveCredentialsFile('credentials.json')
-                        drive = GoogleDrive(gauth)
+                        backend.connect()
                         if VERBOSE: print()
-                        for asset in all:
-                            lastid = '1SCVtkcVs6I3Gwhqqehh7NsR74qs_fAq-'
-                            rel = asset.relative_to(addon.root)
-                            print(f'  Uploading "{rel}" ... ', end='')
-                            sys.stdout.flush()
-                            for folder in rel.parts:
-                                if folder == rel.name: break
-                                # Check if the folder exists before creating new one
-                                file_list = drive.ListFile({"q": f"title='{folder}' and '{lastid}' in parents and mimeType='application/vnd.google-apps.folder' and trashed=false"}).GetList()
-                                if not file_list:
-                                    lastfile = drive.CreateFile({
-                                        'title': str(folder),
-                                        'parents': [{'id': lastid}],
-                                        'mimeType': 'application/vnd.google-apps.folder'
-                                    })
-                                    lastfile.Upload()
-                                else:
-                                    lastfile = file_list[0]
-                                lastid = lastfile['id']
-                            # Upload actual file
-                            file_list = drive.ListFile({"q": f"title='{asset.name}' and '{lastid}' in parents and trashed=false"}).GetList()
-                            if not file_list:
-                                gfile = drive.CreateFile({
-                                    'title': asset.name,
-                                    'parents': [{'id': lastid}],
-                                })
-                            else:
-                                gfile = file_list[0]
-                            if mime := file_mimetype(asset.name):
-                                gfile['mimeType'] = mime
-                            gfile.SetContentFile(str(asset.file))
-                            gfile.Upload()
-                            print('DONE')
+                        uploaded, unchanged = upload_files(backend, files, UPLOAD_JOBS, upload_journal_path, load_upload_hashes(release_path))
                         time_taken = datetime.timedelta(seconds=time.time() - upload_time_start)
-                        print(f'DONE - Time taken: {time_taken}')
+                        print(f'DONE - {uploaded} uploaded, {unchanged} unchanged - Time taken: {time_taken}')
+                        if VERBOSE: print(f'{backend.requests} requests made.')
                         break
-                    except RefreshError as e:
+                    except backend.retry_errors as e:
                         if error_count > 0:
-                            print(f'Google Drive encountered another exception so cancelling drive upload. Make sure credentials in settings.yaml are correct: {e}')
+                            if isinstance(backend, DriveBackend):
+                                print(f'Google Drive encountered another exception so cancelling drive upload. Make sure credentials in settings.yaml are correct: {e}')
+                            else:
+                                print(f'{backend.name} encountered another exception so cancelling upload: {e}')
                             break
                         else:
-                            print(f'Google Drive refresh error occured. Deleting credentials.json to attempt refresh...')
-                            if os.path.exists('credentials.json'):
-                                os.remove('credentials.json')
+                            if isinstance(backend, DriveBackend):
+                                print(f'Google Drive refresh error occured. Deleting credentials.json to attempt refresh...')
+                            else:
+                                print(f'{backend.name} failed, retrying: {e}')
+                            backend.reset()
                             error_count += 1
                             continue
                     except Exception as e:
-                        print(f"Google Drive encountered unfixable exception: {e}")
+                        print(f"Upload encountered unfixable exception: {e}")
                         break
         else:
             print("Cannot parse assets because 'release_assets.txt' doesn't exist")
@@ -0,0 +1,96 @@
+"""Tests for removing assets from release categories.
+
+Run from the addon root:
+    python -m unittest discover tests
+
+https://github.com/FrostSource/hla_extravaganza
+"""
+import os
+import tempfile
+import unittest
+
+import pack_releases
+from pack_releases import Asset, AssetCategory, PlanFingerprint, parse_manifest, plan_assets, resolve_assets
+import tools.lib.addon as addon
+
+class RemoveListTest(unittest.TestCase):
+    def setUp(self):
+        self._temp = tempfile.TemporaryDirectory()
+        self.root = self._temp.name
+
+    def tearDown(self):
+        self._temp.cleanup()
+
+    def folder(self, name:str, count:int)->list[str]:
+        return [os.path.join(self.root, name, f'file_{i:05}.lua') for i in range(count)]
+
+    def test_large_folder_removed_without_skipping(self):
+        # Removing while iterating once skipped every other element
+        kept = self.folder('kept', 100)
+        excluded = self.folder('excluded', 5000)
+        category = AssetCategory('test', [Asset(x) for x in kept + excluded])
+
+        removed = category.remove_list(list(excluded))
+
+        self.assertEqual(len(removed), len(excluded))
+        self.assertEqual([x.original_path for x in removed], excluded)
+        self.assertEqual([x.original_path for x in category.assets], kept)
+
+    def test_strings_and_assets(self):
+        paths = self.folder('mixed', 10)
+        category = AssetCategory('test', [Asset(x) for x in paths])
+
+        removed = category.remove_list([paths[0], Asset(paths[1]), paths[2]])
+
+        self.assertEqual([x.original_path for x in removed], paths[:3])
+        self.assertEqual([x.original_path for x in category.assets], paths[3:])
+
+    def test_missing_entries_ignored(self):
+        paths = self.folder('present', 10)
+        missing = self.folder('missing', 10)
+        category = AssetCategory('test', [Asset(x) for x in paths])
+
+        removed = category.remove_list(missing + [paths[5], paths[5]])
+
+        self.assertEqual([x.original_path for x in removed], [paths[5]])
+        self.assertEqual(len(category.assets), 9)
+        self.assertEqual(category.remove_list([]), [])
+
+class RemoveFolderManifestTest(unittest.TestCase):
+    """Runs a manifest with a ~folder/ line through the whole resolve pipeline."""
+    def setUp(self):
+        self._temp = tempfile.TemporaryDirectory()
+        self.root = os.path.realpath(self._temp.name)
+        self._index = addon.content_index
+        addon.content_index = addon.FileIndex(self.root)
+        self._verbose = getattr(pack_releases, 'VERBOSE', False)
+        pack_releases.VERBOSE = False
+
+    def tearDown(self):
+        addon.content_index = self._index
+        pack_releases.VERBOSE = self._verbose
+        self._temp.cleanup()
+
+    def write(self, *paths:str)->list[str]:
+        files = []
+        for path in paths:
+            file = os.path.join(self.root, path)
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+            with open(file, 'w') as f:
+                f.write(path)
+            files.append(file)
+        return files
+
+    def test_folder_removed_and_neighbours_kept(self):
+        removed = self.write(*[f'assets/drop/file_{i:03}.txt' for i in range(200)], 'assets/drop/sub/nested.txt')
+        kept = self.write('assets/keep.txt', 'assets/drop_sibling/file.txt', 'assets/dropped.txt', 'assets/keep/drop/file.txt')
+        src = 'test:\n    assets\n    ~assets/drop/\n'
+
+        categories = resolve_assets(plan_assets(parse_manifest(src)), PlanFingerprint())
+
+        paths = sorted(asset.original_path for asset in categories['test'].assets)
+        self.assertEqual(paths, sorted(kept))
+        self.assertTrue(set(paths).isdisjoint(removed))
+
+if __name__ == '__main__':
+    unittest.main()
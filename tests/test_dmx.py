@@ -0,0 +1,53 @@
+"""Tests for reading binary DMX maps.
+
+Run from the addon root:
+    python -m unittest discover tests
+
+https://github.com/FrostSource/hla_extravaganza
+"""
+import os
+import tempfile
+import unittest
+
+from tools.lib.dmx import DmxError, DmxReader
+
+map_path = os.path.join('maps', 'prefabs', 'effects', 'traced_laser', 'traced_laser.vmap')
+
+class CutOffMapTest(unittest.TestCase):
+    def setUp(self):
+        self._temp = tempfile.TemporaryDirectory()
+        with open(map_path, 'rb') as f:
+            self.data = f.read()
+        with DmxReader(map_path) as reader:
+            reader.prefix_attributes()
+            self.strings_start = reader._strings_start
+
+    def tearDown(self):
+        self._temp.cleanup()
+
+    def cut(self, size:int)->str:
+        path = os.path.join(self._temp.name, f'cut_{size}.vmap')
+        with open(path, 'wb') as f:
+            f.write(self.data[:size])
+        return path
+
+    def test_whole_map_reads(self):
+        with DmxReader(self.cut(len(self.data))) as reader:
+            self.assertTrue(reader.strings())
+            self.assertTrue(reader.asset_references())
+
+    def test_cut_off_map_raises_dmx_error(self):
+        sizes = {
+            'element count': 49,
+            'thumbnail': 1000,
+            'asset references': self.strings_start - 20,
+            'string count': self.strings_start + 2,
+            'string table': self.strings_start + 100,
+        }
+        for part, size in sizes.items():
+            with self.subTest(part), DmxReader(self.cut(size)) as reader:
+                with self.assertRaisesRegex(DmxError, 'is cut off at'):
+                    reader.strings()
+
+if __name__ == '__main__':
+    unittest.main()
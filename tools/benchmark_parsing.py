@@ -0,0 +1,38 @@
+"""Measures parsing speed of the Lua doc parser.
+
+Compares the current parser against the one from before the compiled tokenizer,
+which is kept unchanged in tools._legacy_parsing for this purpose.
+
+Run from the addon root:
+    python -m tools.benchmark_parsing [glob ...]
+
+https://github.com/FrostSource/hla_extravaganza
+"""
+from glob import glob
+import os
+import sys
+import time
+
+import tools._legacy_parsing as legacy
+import tools.lua_doc_to_html as luadoc
+
+def benchmark(name:str, parse_lua_file, files:list[str], repeat:int = 3):
+    best = float('inf')
+    functions = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        functions = sum(len(parse_lua_file(file)[0]) for file in files)
+        best = min(best, time.perf_counter() - start)
+    print(f'{name:>10}: {functions} functions in {best:.3f}s ({len(files) / best:,.1f} files/sec)')
+    return best
+
+if __name__ == '__main__':
+    patterns = sys.argv[1:] or ['scripts/vscripts/*.lua']
+    files = sorted({file for pattern in patterns for file in glob(pattern, recursive=True)})
+    if not files:
+        print('No files found to benchmark.')
+        sys.exit(1)
+    print(f'Parsing {len(files)} files ({sum(os.path.getsize(file) for file in files):,} bytes)')
+    before = benchmark('legacy', legacy.parse_lua_file, files)
+    after = benchmark('current', luadoc.parse_lua_file, files)
+    print(f'Speedup: {before / after:.1f}x')
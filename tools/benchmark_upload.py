@@ -0,0 +1,80 @@
+"""Measures the upload loop against a local folder standing in for Google Drive.
+
+Each request to the stand-in waits for a fixed latency so the number of
+round trips shows up in the time taken, like it would with a real server.
+The last run makes an upload fail half way through and resumes it from its journal.
+
+Run from the addon root:
+    python -m tools.benchmark_upload [--latency SECONDS] [--jobs N] [glob ...]
+
+https://github.com/FrostSource/hla_extravaganza
+"""
+import argparse
+import contextlib
+from glob import glob
+import os
+from pathlib import Path, PurePosixPath
+import tempfile
+import time
+
+from tools.lib.upload import LocalBackend, upload_files
+
+def benchmark(name:str, backend:LocalBackend, files:list[tuple[Path,PurePosixPath]], jobs:int, journal_path = None):
+    backend.requests = 0
+    start = time.perf_counter()
+    backend.connect()
+    # Only the timings matter here, not the line printed for every file
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        uploaded, unchanged = upload_files(backend, files, jobs, journal_path)
+    elapsed = time.perf_counter() - start
+    print(f'{name:>10}: {uploaded} uploaded, {unchanged} unchanged, {backend.requests} requests in {elapsed:.3f}s ({len(files) / elapsed:,.1f} files/sec)')
+    return elapsed
+
+def benchmark_resume(files:list[tuple[Path,PurePosixPath]], latency:float, jobs:int, first_requests:int):
+    """Fail an upload once half its files are uploaded, then carry on like pack_releases does after an error."""
+    with tempfile.TemporaryDirectory() as folder:
+        journal_path = Path(folder, 'journal.jsonl')
+        # Uploads are the last requests so this fails with half of them left
+        backend = LocalBackend(Path(folder, 'remote'), latency, fail_after=first_requests - len(files) // 2)
+        start = time.perf_counter()
+        backend.connect()
+        try:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                upload_files(backend, files, jobs, journal_path)
+            print(f'{"failed":>10}: upload finished without failing')
+            return
+        except backend.retry_errors as e:
+            elapsed = time.perf_counter() - start
+            print(f'{"failed":>10}: {e}, {backend.requests} requests in {elapsed:.3f}s')
+        backend.reset()
+        benchmark('resumed', backend, files, jobs, journal_path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='benchmark_upload')
+    parser.add_argument('--latency', type=float, default=0.01, help='seconds each request takes')
+    parser.add_argument('--jobs', type=int, default=4, help='number of files uploaded at once')
+    parser.add_argument('patterns', nargs='*', default=['scripts/vscripts/**/*.lua'])
+    args = parser.parse_args()
+
+    paths = sorted({file for pattern in args.patterns for file in glob(pattern, recursive=True) if os.path.isfile(file)})
+    if not paths:
+        print('No files found to benchmark.')
+        exit(1)
+    files = [(Path(path), PurePosixPath(Path(path).as_posix())) for path in paths]
+
+    with tempfile.TemporaryDirectory() as folder:
+        backend = LocalBackend(folder, args.latency)
+        print(f'Uploading {len(files)} files with {args.latency * 1000:.0f}ms latency per request')
+        benchmark('first', backend, files, args.jobs)
+        first_requests = backend.requests
+        benchmark('repeat', backend, files, args.jobs)
+        # Every file changed so none can be skipped
+        with tempfile.TemporaryDirectory() as changed:
+            changed_files = []
+            for path, rel in files:
+                copy = Path(changed, rel)
+                copy.parent.mkdir(parents=True, exist_ok=True)
+                copy.write_bytes(path.read_bytes() + b'\n')
+                changed_files.append((copy, rel))
+            benchmark('changed', backend, changed_files, args.jobs)
+        benchmark_resume(files, args.latency, args.jobs, first_requests)
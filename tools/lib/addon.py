@@ -1,8 +1,10 @@
 
 from pathlib import Path
 import os
-from fnmatch import fnmatch
-from typing import AnyStr
+from fnmatch import fnmatch, translate
+from functools import lru_cache
+import re
+from typing import AnyStr, Iterator
 
 __script_dir = Path(__file__)
 
@@ -50,43 +52,229 @@ else:
 if content_path: content_path = content_path.resolve()
 if game_path: game_path = game_path.resolve()
 
-__ignore_paths = [
+_ignore_paths = [
     '.git'
 ]
 
-# Get all addon files
-def __get_files(start: str) -> list[Path]:
-    file_list: list[Path] = []
-    for dirpath, dirs, files in os.walk(start):
-        dirs[:] = [d for d in dirs if d not in __ignore_paths]
-        file_list.extend([Path(os.path.join(dirpath, file)) for file in files])
-    return file_list
+# Characters that make a path component a wildcard instead of a literal name
+_wildcard_chars = set('*?[')
 
-content_files: list[Path] = []
-game_files: list[Path] = []
-if content_path: content_files = __get_files(content_path)
-if game_path: game_files = __get_files(game_path)
+@lru_cache(maxsize=None)
+def _compile_glob(pattern: str) -> re.Pattern:
+    """Compile a normcased fnmatch pattern to a regex once."""
+    return re.compile(translate(pattern))
+
+class _DirNode:
+    """A folder in a `FileIndex` trie. Children are keyed by normcased name."""
+    __slots__ = ('rel', 'name', 'dirs', 'files', 'scanned', 'subtree')
+    def __init__(self, rel: str, name: str):
+        self.rel = rel
+        self.name = name
+        self.dirs: dict[str, _DirNode] = {}
+        # Normcased file name -> relative path
+        self.files: dict[str, str] = {}
+        self.scanned = False
+        # Cached (relative path, normcased relative path) of every file under this folder
+        self.subtree: list[tuple[str, str]]|None = None
+
+class FileIndex:
+    """Lazily scanned index of the files under a root folder.
+
+    Folders are kept in a trie and only scanned with `os.scandir` the first time
+    a search reaches them. Ignored or excluded folders are never entered.
+    All paths are kept as strings relative to the root.
+    """
+    def __init__(self, root: Path|str):
+        self.root = str(root)
+        self.excluded: list[str] = []
+        self._tree = _DirNode('', '')
+
+    def _scan(self, node: _DirNode) -> _DirNode:
+        if not node.scanned:
+            node.scanned = True
+            try:
+                with os.scandir(os.path.join(self.root, node.rel)) as it:
+                    for entry in it:
+                        rel = os.path.join(node.rel, entry.name)
+                        if entry.is_dir():
+                            node.dirs[os.path.normcase(entry.name)] = _DirNode(rel, entry.name)
+                        else:
+                            node.files[os.path.normcase(entry.name)] = rel
+            except (FileNotFoundError, NotADirectoryError):
+                pass
+        return node
+
+    def _is_pruned(self, node: _DirNode) -> bool:
+        """Get if every file inside a folder is ignored or excluded, so it doesn't need walking.
+        """
+        if node.name in _ignore_paths:
+            return True
+        # A pattern ending in * that matches the folder also matches everything inside it
+        key = os.path.normcase(node.rel + os.sep)
+        return any(p.endswith('*') and _compile_glob(p).match(key) for p in self.excluded)
+
+    def _is_excluded(self, key: str) -> bool:
+        return any(_compile_glob(p).match(key) for p in self.excluded)
+
+    def _node(self, rel_dir: str) -> _DirNode|None:
+        """Get the trie node of a relative folder, or None if it doesn't exist or is pruned.
+        """
+        node = self._tree
+        for name in filter(None, os.path.normcase(rel_dir).split(os.sep)):
+            node = self._scan(node).dirs.get(name)
+            if node is None or self._is_pruned(node):
+                return None
+        return node
+
+    def _subtree(self, node: _DirNode) -> list[tuple[str, str]]:
+        if node.subtree is None:
+            self._scan(node)
+            files = []
+            for rel in node.files.values():
+                key = os.path.normcase(rel)
+                if not self._is_excluded(key):
+                    files.append((rel, key))
+            for child in node.dirs.values():
+                if not self._is_pruned(child):
+                    files.extend(self._subtree(child))
+            node.subtree = files
+        return node.subtree
+
+    def _clear_subtrees(self, node: _DirNode):
+        node.subtree = None
+        for child in node.dirs.values():
+            self._clear_subtrees(child)
+
+    def walk(self, rel_dir: str = '') -> Iterator[str]:
+        """Generate the relative path of every file that isn't excluded under a folder.
+
+        Args:
+            rel_dir (str, optional): Relative folder to start from. Defaults to the root.
+
+        Returns:
+            Iterator[str]: Relative file paths.
+        """
+        node = self._node(rel_dir)
+        if node is not None:
+            for rel, _ in self._subtree(node):
+                yield rel
+
+    def expand_pattern(self, pattern: str) -> str:
+        """Turn a folder pattern into a pattern matching everything inside it.
+        """
+        pattern = os.path.normpath(pattern) if pattern else pattern
+        if pattern and os.path.isdir(os.path.join(self.root, pattern)):
+            pattern = os.path.join(pattern, '*')
+        return pattern
+
+    def find(self, pattern: str) -> list[str]:
+        """Find all files matching a pattern relative to the root.
+
+        Only the folder named by the literal part of the pattern is searched,
+        and a pattern without wildcards is a single lookup.
+
+        Args:
+            pattern (str): Glob style pattern, * also matches across folders.
+
+        Returns:
+            list[str]: Absolute file paths.
+        """
+        pattern = os.path.normcase(self.expand_pattern(pattern))
+        *parts, file_name = pattern.split(os.sep)
+        literal: list[str] = []
+        for part in parts:
+            if _wildcard_chars.intersection(part):
+                break
+            literal.append(part)
+        node = self._node(os.sep.join(literal))
+        if node is None:
+            return []
+        if len(literal) == len(parts) and not _wildcard_chars.intersection(file_name):
+            rel = self._scan(node).files.get(file_name)
+            if rel is None or self._is_excluded(pattern):
+                return []
+            return [os.path.join(self.root, rel)]
+        match = _compile_glob(pattern).match
+        return [os.path.join(self.root, rel) for rel, key in self._subtree(node) if match(key)]
+
+    def searched_paths(self, pattern: str) -> list[str]:
+        """Get the files and folders a `find` for a pattern depends on.
+
+        A search through folders can only change if files are added to or removed
+        from them, and a lookup without wildcards only if that one path appears or
+        disappears, so their modified times can be used to tell if the result did.
+
+        Args:
+            pattern (str): Glob style pattern, same as `find`.
+
+        Returns:
+            list[str]: Absolute paths, some may not exist.
+        """
+        pattern = os.path.normcase(self.expand_pattern(pattern))
+        *parts, file_name = pattern.split(os.sep)
+        node = self._tree
+        for part in parts:
+            if _wildcard_chars.intersection(part):
+                break
+            child = self._scan(node).dirs.get(part)
+            if child is None or self._is_pruned(child):
+                # Nothing is found until this folder exists
+                return [os.path.join(self.root, node.rel, part)]
+            node = child
+        else:
+            if not _wildcard_chars.intersection(file_name):
+                return [os.path.join(self.root, node.rel, file_name)]
+        stack = [node]
+        searched = []
+        while stack:
+            folder = self._scan(stack.pop())
+            searched.append(os.path.normpath(os.path.join(self.root, folder.rel)))
+            stack.extend(child for child in folder.dirs.values() if not self._is_pruned(child))
+        return searched
+
+    def exclude(self, pattern: str|list[str]):
+        """Exclude files matching one or more patterns from all future searches.
+        """
+        if isinstance(pattern, str):
+            pattern = [pattern]
+        self.excluded.extend(os.path.normcase(self.expand_pattern(p)) for p in pattern)
+        self._clear_subtrees(self._tree)
+
+    def files(self) -> list[str]:
+        return [os.path.join(self.root, file) for file in self.walk()]
+
+content_index = FileIndex(content_path) if content_path else None
+game_index = FileIndex(game_path) if game_path else None
+
+def __getattr__(name: str):
+    # Full file lists are only walked if something asks for them
+    if name == 'content_files':
+        return content_index.files() if content_index else []
+    if name == 'game_files':
+        return game_index.files() if game_index else []
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def find_files(files: list[Path|str], pattern: AnyStr, relative_to: Path|str = content_path):
     if os.path.isdir(pattern): pattern = os.path.join(pattern, '*')
-    return [str(file) for file in files if fnmatch(file.relative_to(relative_to), pattern)]
+    return [str(file) for file in files if fnmatch(os.path.relpath(file, relative_to), pattern)]
 
 def exclude_files(files: list[Path|str], pattern: AnyStr|list[AnyStr], relative_to: Path|str = content_path) -> list[Path|str]:
     if isinstance(pattern, str):
         pattern = [pattern]
     pattern = [os.path.join(p, '*') if os.path.isdir(p) else p for p in pattern]
-    return [file for file in files if not any(fnmatch(file.relative_to(relative_to), p) for p in pattern)]
+    return [file for file in files if not any(fnmatch(os.path.relpath(file, relative_to), p) for p in pattern)]
 
 def find_content_files(pattern: AnyStr):
-    return find_files(content_files, pattern, relative_to=content_path)
+    return content_index.find(pattern) if content_index else []
 
 def find_game_files(pattern: AnyStr):
-    return find_files(game_files, pattern, relative_to=game_path)
+    return game_index.find(pattern) if game_index else []
+
+def searched_content_paths(pattern: AnyStr):
+    return content_index.searched_paths(pattern) if content_index else []
 
 def exclude_content_files(pattern: AnyStr):
-    global content_files
-    content_files = exclude_files(content_files, pattern, content_path)
+    if content_index: content_index.exclude(pattern)
 
 def exclude_game_files(pattern: AnyStr):
-    global game_files
-    game_files = exclude_files(game_files, pattern, content_path)
+    if game_index: game_index.exclude(pattern)
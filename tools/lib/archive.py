@@ -0,0 +1,191 @@
+"""Zip writing helpers for the extravaganza toolset.
+
+Entries are compressed separately from writing so compression can happen on
+other threads while the archive itself is still written in a single pass.
+
+https://github.com/FrostSource/hla_extravaganza
+"""
+import bz2
+import copy
+import lzma
+import struct
+import sys
+from typing import BinaryIO
+from zipfile import ZipFile, ZipInfo, BadZipFile, ZIP_STORED, ZIP_DEFLATED, ZIP_BZIP2, ZIP_LZMA
+import zlib
+
+compression_methods = {
+    'stored': ZIP_STORED,
+    'deflated': ZIP_DEFLATED,
+    'bzip2': ZIP_BZIP2,
+    'lzma': ZIP_LZMA,
+}
+
+# General purpose flag bit set when LZMA data ends with an end-of-stream (EOS) marker
+FLAG_LZMA_EOS = 0x02
+# General purpose flag bit set when the CRC and sizes follow the data instead of being in the local header
+FLAG_DATA_DESCRIPTOR = 0x08
+# Extra field holding 64-bit sizes and offsets
+EXTRA_ZIP64 = 0x0001
+
+# Local file header up to the name and extra field, see the zip APPNOTE section 4.3.7
+_local_header = struct.Struct('<4s5H3L2H')
+_local_header_signature = b'PK\x03\x04'
+_extra_header = struct.Struct('<HH')
+
+# Writing already compressed data needs ZipFile internals, which are only relied on
+# for the versions they're known to work with. Other versions compress through writestr instead.
+raw_writes = (3, 10) <= sys.version_info[:2] <= (3, 13)
+
+def _compress_lzma(data: bytes, preset: int|None) -> bytes:
+    """Compress data in the LZMA format zips use.
+
+    The .lzma "alone" format starts with the same 5 bytes of properties zips need,
+    followed by the uncompressed size which zips leave out.
+    """
+    compressor = lzma.LZMACompressor(lzma.FORMAT_ALONE, filters=[{'id': lzma.FILTER_LZMA1, 'preset': 6 if preset is None else preset}])
+    compressed = compressor.compress(data) + compressor.flush()
+    props = compressed[:5]
+    # LZMA SDK version 9.4 like ZipFile writes
+    return struct.pack('<BBH', 9, 4, len(props)) + props + compressed[13:]
+
+def compress(zinfo: ZipInfo, data: bytes, compresslevel: int|None = None) -> bytes:
+    """Compress data for a zip entry using the entry's compression type.
+
+    The CRC, sizes and flags of `zinfo` are filled in. This doesn't touch any
+    archive so it is safe to call from multiple threads.
+
+    Args:
+        zinfo (ZipInfo): Entry the data belongs to.
+        data (bytes): Uncompressed data.
+        compresslevel (int, optional): Level passed to the compressor. Defaults to the compressor default.
+
+    Raises:
+        ValueError: If the compression type isn't supported.
+
+    Returns:
+        bytes: Compressed data.
+    """
+    zinfo.file_size = len(data)
+    zinfo.CRC = zlib.crc32(data)
+    zinfo.flag_bits = 0x00
+    if zinfo.compress_type == ZIP_STORED:
+        compressed = data
+    elif zinfo.compress_type == ZIP_DEFLATED:
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION if compresslevel is None else compresslevel, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+    elif zinfo.compress_type == ZIP_BZIP2:
+        compressed = bz2.compress(data, 9 if compresslevel is None else compresslevel)
+    elif zinfo.compress_type == ZIP_LZMA:
+        zinfo.flag_bits |= FLAG_LZMA_EOS
+        compressed = _compress_lzma(data, compresslevel)
+    else:
+        raise ValueError(f'Compression method {zinfo.compress_type} is not supported')
+    zinfo.compress_size = len(compressed)
+    return compressed
+
+def write_raw(zip_obj: ZipFile, zinfo: ZipInfo, compressed: bytes):
+    """Write an entry whose data is already compressed, e.g. by `compress`.
+
+    Only available when `raw_writes` is set, see `write_entry`.
+
+    Args:
+        zip_obj (ZipFile): Archive opened for writing.
+        zinfo (ZipInfo): Entry with CRC and sizes already set.
+        compressed (bytes): Compressed data.
+    """
+    if not zinfo.external_attr:
+        zinfo.external_attr = 0o600 << 16
+    with zip_obj._lock:
+        if zip_obj._seekable:
+            zip_obj.fp.seek(zip_obj.start_dir)
+        zinfo.header_offset = zip_obj.fp.tell()
+        zip_obj._writecheck(zinfo)
+        zip_obj._didModify = True
+        zip_obj.fp.write(zinfo.FileHeader())
+        zip_obj.fp.write(compressed)
+        zip_obj.start_dir = zip_obj.fp.tell()
+        zip_obj.filelist.append(zinfo)
+        zip_obj.NameToInfo[zinfo.filename] = zinfo
+
+def write_entry(zip_obj: ZipFile, zinfo: ZipInfo, data: bytes, compressed: bytes|None, compresslevel: int|None = None):
+    """Write an entry, using its already compressed data if the running Python allows it.
+
+    Args:
+        zip_obj (ZipFile): Archive opened for writing.
+        zinfo (ZipInfo): Entry to write, filled in by `compress` if `compressed` is given.
+        data (bytes): Uncompressed data.
+        compressed (bytes, optional): Data from `compress`, None to compress while writing.
+        compresslevel (int, optional): Level used when compressing while writing.
+    """
+    if raw_writes and compressed is not None:
+        write_raw(zip_obj, zinfo, compressed)
+    else:
+        zip_obj.writestr(zinfo, data, compresslevel=compresslevel)
+
+def read_raw(fp: BinaryIO, zinfo: ZipInfo) -> bytes:
+    """Read the compressed data of an entry without decompressing it.
+
+    Args:
+        fp (BinaryIO): The archive file opened in binary mode, separate from any ZipFile reading it.
+        zinfo (ZipInfo): Entry to read.
+
+    Raises:
+        BadZipFile: If the entry's local header is invalid.
+
+    Returns:
+        bytes: Compressed data.
+    """
+    fp.seek(zinfo.header_offset)
+    header = fp.read(_local_header.size)
+    if len(header) != _local_header.size:
+        raise BadZipFile(f'Bad local header for {zinfo.filename}')
+    fields = _local_header.unpack(header)
+    if fields[0] != _local_header_signature:
+        raise BadZipFile(f'Bad local header for {zinfo.filename}')
+    # Skip the name and extra field
+    fp.seek(fields[9] + fields[10], 1)
+    return fp.read(zinfo.compress_size)
+
+def strip_extra(extra: bytes, header_id: int) -> bytes:
+    """Remove every field with a header ID from an entry's extra data.
+
+    Args:
+        extra (bytes): Extra data made of fields each starting with a 2 byte ID and 2 byte size.
+        header_id (int): ID of the fields to remove.
+
+    Returns:
+        bytes: Extra data without those fields. Trailing bytes too short to be a field are kept.
+    """
+    kept = bytearray()
+    i = 0
+    while i + _extra_header.size <= len(extra):
+        field_id, size = _extra_header.unpack_from(extra, i)
+        end = i + _extra_header.size + size
+        if field_id != header_id:
+            kept += extra[i:end]
+        i = end
+    kept += extra[i:]
+    return bytes(kept)
+
+def copy_entry(source: ZipFile, source_fp: BinaryIO, zinfo: ZipInfo, dest: ZipFile, compresslevel: int|None = None):
+    """Copy an entry byte for byte from one archive to another without recompressing it.
+
+    When `raw_writes` isn't set the entry is decompressed and compressed again instead.
+
+    Args:
+        source (ZipFile): Archive opened for reading.
+        source_fp (BinaryIO): The same archive opened in binary mode, see `read_raw`.
+        zinfo (ZipInfo): Entry in `source` to copy.
+        dest (ZipFile): Archive opened for writing.
+        compresslevel (int, optional): Level used if the entry is compressed again.
+    """
+    new_info = copy.copy(zinfo)
+    # Sizes are known up front so no data descriptor is written after the data
+    new_info.flag_bits &= ~FLAG_DATA_DESCRIPTOR
+    # Written again by ZipFile only if the entry still needs it
+    new_info.extra = strip_extra(zinfo.extra, EXTRA_ZIP64)
+    if raw_writes:
+        write_raw(dest, new_info, read_raw(source_fp, zinfo))
+    else:
+        dest.writestr(new_info, source.read(zinfo), compresslevel=compresslevel)
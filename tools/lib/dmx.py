@@ -0,0 +1,233 @@
+"""Binary DMX reading for the extravaganza toolset.
+
+Files are memory mapped and only the parts asked for are read. The prefix
+attributes at the start of a file, which hold things like the compiled asset
+references of a map, and the string table after them can both be read without
+touching the element graph that makes up the rest of the file.
+
+https://github.com/FrostSource/hla_extravaganza
+"""
+import mmap
+import re
+import struct
+from typing import NamedTuple
+
+_header_regex = re.compile(rb'<!-- dmx encoding (\S+) (\d+) format (\S+) (\d+) -->\n')
+
+# Attribute types that can appear in prefix attributes, arrays are the same types offset by ARRAY_OFFSET
+AT_ELEMENT = 1
+AT_INT = 2
+AT_FLOAT = 3
+AT_BOOL = 4
+AT_STRING = 5
+AT_BINARY = 6
+AT_TIME = 7
+AT_COLOR = 8
+AT_VECTOR2 = 9
+AT_VECTOR3 = 10
+AT_VECTOR4 = 11
+AT_QANGLE = 12
+AT_QUATERNION = 13
+AT_VMATRIX = 14
+AT_UINT64 = 15
+AT_UINT8 = 16
+ARRAY_OFFSET = 32
+
+# Fixed size attribute types and how they're unpacked
+_fixed_types = {
+    AT_ELEMENT: struct.Struct('<i'),
+    AT_INT: struct.Struct('<i'),
+    AT_FLOAT: struct.Struct('<f'),
+    AT_BOOL: struct.Struct('<?'),
+    AT_TIME: struct.Struct('<i'),
+    AT_COLOR: struct.Struct('<4B'),
+    AT_VECTOR2: struct.Struct('<2f'),
+    AT_VECTOR3: struct.Struct('<3f'),
+    AT_VECTOR4: struct.Struct('<4f'),
+    AT_QANGLE: struct.Struct('<3f'),
+    AT_QUATERNION: struct.Struct('<4f'),
+    AT_VMATRIX: struct.Struct('<16f'),
+    AT_UINT64: struct.Struct('<Q'),
+    AT_UINT8: struct.Struct('<B'),
+}
+
+_int = struct.Struct('<i')
+_byte = struct.Struct('<B')
+
+class DmxError(Exception):
+    """The file isn't a binary DMX file that can be read."""
+
+class Blob(NamedTuple):
+    """Where a binary attribute value is in the file, read with `DmxReader.read_blob`."""
+    offset: int
+    size: int
+
+class DmxReader:
+    """Reads parts of a binary DMX file such as a .vmap.
+
+    Can be used as a context manager to close the file when done.
+    """
+    def __init__(self, path):
+        """
+        Args:
+            path (str|Path): The DMX file.
+
+        Raises:
+            DmxError: If the file isn't binary DMX.
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files can't be mapped
+                raise DmxError(f'{path} is empty')
+        m = _header_regex.match(self._data, 0, 128)
+        if m is None:
+            self.close()
+            raise DmxError(f'{path} has no DMX header')
+        self.encoding = m[1].decode()
+        self.encoding_version = int(m[2])
+        self.format = m[3].decode()
+        self.format_version = int(m[4])
+        if self.encoding != 'binary' or self.encoding_version < 5:
+            self.close()
+            raise DmxError(f'{path} is "{self.encoding} {self.encoding_version}", only binary 5 and up is supported')
+        # Header string is null terminated
+        self._prefix_start = m.end() + 1
+        self._prefix:list[dict[str,object]]|None = None
+        self._strings_start:int|None = None
+        self._strings:list[str]|None = None
+
+    def _string(self, pos:int) -> tuple[str,int]:
+        end = self._data.find(b'\0', pos)
+        if end == -1:
+            raise DmxError(f'{self.path} is cut off at {pos}')
+        return self._data[pos:end].decode('utf-8', errors='replace'), end + 1
+
+    def _unpack(self, fixed:struct.Struct, pos:int) -> tuple:
+        if pos < 0 or pos + fixed.size > len(self._data):
+            raise DmxError(f'{self.path} is cut off at {pos}')
+        return fixed.unpack_from(self._data, pos)
+
+    def _value(self, attr_type:int, pos:int) -> tuple[object,int]:
+        if attr_type >= ARRAY_OFFSET:
+            count = self._unpack(_int, pos)[0]
+            pos += 4
+            values = []
+            for _ in range(count):
+                value, pos = self._value(attr_type - ARRAY_OFFSET, pos)
+                values.append(value)
+            return values, pos
+        if attr_type == AT_STRING:
+            return self._string(pos)
+        if attr_type == AT_BINARY:
+            length = self._unpack(_int, pos)[0]
+            pos += 4
+            if length < 0 or pos + length > len(self._data):
+                raise DmxError(f'{self.path} is cut off at {pos}')
+            # Left unread until used, big thumbnails are skipped for free
+            return Blob(pos, length), pos + length
+        fixed = _fixed_types.get(attr_type)
+        if fixed is None:
+            raise DmxError(f'{self.path} has unknown attribute type {attr_type} at {pos - 1}')
+        value = self._unpack(fixed, pos)
+        return value[0] if len(value) == 1 else value, pos + fixed.size
+
+    def prefix_attributes(self) -> list[dict[str,object]]:
+        """Read the prefix attributes that come before the string table.
+
+        Strings are inline in the prefix so it can be read on its own.
+        Files older than binary 9 have no prefix.
+
+        Raises:
+            DmxError: If the file is cut off or has an unknown attribute type.
+
+        Returns:
+            list[dict[str,object]]: Attributes of each prefix element by name.
+            Binary values are `Blob` locations.
+        """
+        if self._prefix is None:
+            prefix:list[dict[str,object]] = []
+            pos = self._prefix_start
+            if self.encoding_version >= 9:
+                element_count = self._unpack(_int, pos)[0]
+                pos += 4
+                for _ in range(element_count):
+                    attributes:dict[str,object] = {}
+                    attribute_count = self._unpack(_int, pos)[0]
+                    pos += 4
+                    for _ in range(attribute_count):
+                        name, pos = self._string(pos)
+                        attr_type = self._unpack(_byte, pos)[0]
+                        attributes[name], pos = self._value(attr_type, pos + 1)
+                    prefix.append(attributes)
+            self._prefix = prefix
+            self._strings_start = pos
+        return self._prefix
+
+    def strings(self) -> list[str]:
+        """Read the string table, which holds every element type, attribute name and string value in the file.
+
+        Raises:
+            DmxError: If the file is cut off.
+
+        Returns:
+            list[str]: The strings in table order.
+        """
+        if self._strings is None:
+            self.prefix_attributes()
+            pos = self._strings_start
+            count = self._unpack(_int, pos)[0]
+            pos += 4
+            end = pos
+            for _ in range(count):
+                end = self._data.find(b'\0', end)
+                if end == -1:
+                    raise DmxError(f'{self.path} is cut off at {len(self._data)}')
+                end += 1
+            # Decoded in one go instead of string by string
+            self._strings = self._data[pos:end-1].decode('utf-8', errors='replace').split('\0') if count else []
+        return self._strings
+
+    def asset_references(self) -> list[str]:
+        """Get the assets a map references, as saved by Hammer in the `map_asset_references` prefix attribute.
+
+        Returns:
+            list[str]: Asset paths relative to the addon, using forward slashes.
+        """
+        for attributes in self.prefix_attributes():
+            references = attributes.get('map_asset_references')
+            if isinstance(references, list):
+                return references
+        return []
+
+    def read_blob(self, blob:Blob) -> bytes:
+        """Read a binary attribute value such as `asset_preview_thumbnail`."""
+        return self._data[blob.offset:blob.offset+blob.size]
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def read_asset_references(path) -> list[str]:
+    """Get the assets referenced by a binary DMX map.
+
+    Args:
+        path (str|Path): The .vmap file.
+
+    Raises:
+        DmxError: If the file isn't binary DMX or is cut off.
+
+    Returns:
+        list[str]: Asset paths relative to the addon.
+    """
+    with DmxReader(path) as reader:
+        return reader.asset_references()
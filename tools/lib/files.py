@@ -0,0 +1,114 @@
+"""File copying helpers for the extravaganza toolset.
+
+https://github.com/FrostSource/hla_extravaganza
+"""
+import os
+import shutil
+import sys
+
+from .util import file_hash
+
+copy_modes = ['copy', 'hardlink', 'reflink']
+
+# Linux ioctl that shares a file's data blocks with another file on filesystems like btrfs and xfs
+_FICLONE = 0x40049409
+
+def _reflink(src, dst):
+    """Clone a file without copying its data.
+
+    Raises:
+        OSError: If the platform or filesystem doesn't support it.
+    """
+    if not sys.platform.startswith('linux'):
+        raise OSError('Reflinks are only supported on Linux')
+    import fcntl
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+
+def is_up_to_date(src, dst, check_hash:bool = False)->bool:
+    """Get if a copied file still matches its source.
+
+    Files are compared by size and modification time, which copies made by `place_file` keep.
+
+    Args:
+        src (str|Path): Source file.
+        dst (str|Path): Copied file.
+        check_hash (bool, optional): Compare the contents instead of the modification time. Defaults to False.
+
+    Returns:
+        bool: If `dst` exists and matches `src`.
+    """
+    try:
+        dst_stat = os.stat(dst)
+    except FileNotFoundError:
+        return False
+    src_stat = os.stat(src)
+    if os.path.samestat(src_stat, dst_stat):
+        return True
+    if src_stat.st_size != dst_stat.st_size:
+        return False
+    if check_hash:
+        return file_hash(src) == file_hash(dst)
+    return src_stat.st_mtime_ns == dst_stat.st_mtime_ns
+
+def copy_data(src, dst):
+    """Copy the contents of a file without passing them through Python.
+
+    `os.copy_file_range` is tried first, which lets the kernel or filesystem copy the data
+    directly or even share it. Otherwise `shutil.copyfile` is used, which has its own
+    fast paths such as `os.sendfile` depending on the platform.
+
+    Args:
+        src (str|Path): Source file.
+        dst (str|Path): Destination file, created or truncated.
+    """
+    if hasattr(os, 'copy_file_range'):
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            try:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    sent = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if sent == 0:
+                        break
+                    remaining -= sent
+                else:
+                    return
+            except OSError:
+                # Not supported between these files, e.g. across filesystems on older kernels
+                pass
+    shutil.copyfile(src, dst)
+
+def place_file(src, dst, mode:str = 'copy')->str:
+    """Put a file at a destination by copying or linking it.
+
+    Any existing file at `dst` is removed first so a previous hardlink never gets written through to its source.
+    The parent folder of `dst` must already exist.
+    Links fall back to a normal copy when the filesystem can't make them.
+
+    Args:
+        src (str|Path): Source file.
+        dst (str|Path): Destination file.
+        mode (str, optional): One of `copy_modes`. Defaults to 'copy'.
+
+    Returns:
+        str: The mode that was actually used.
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if mode == 'hardlink':
+        try:
+            os.link(src, dst)
+            return mode
+        except OSError:
+            pass
+    elif mode == 'reflink':
+        try:
+            _reflink(src, dst)
+            shutil.copystat(src, dst)
+            return mode
+        except OSError:
+            if os.path.lexists(dst):
+                os.remove(dst)
+    copy_data(src, dst)
+    shutil.copystat(src, dst)
+    return 'copy'
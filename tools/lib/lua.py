@@ -0,0 +1,154 @@
+"""Lightweight Lua source scanning for the extravaganza toolset.
+
+https://github.com/FrostSource/hla_extravaganza
+"""
+import os
+from typing import Callable, Iterable
+
+from .parsing import Tokenizer
+
+# Comments and strings are matched whole so names inside them are never seen as calls
+lexer = Tokenizer([
+    ('comment', r'(?s)--\[(?P<comment_level>=*)\[.*?\](?P=comment_level)\]'),
+    ('comment', r'--[^\n]*'),
+    ('string', r'(?s)"(?:[^"\\\n]|\\.)*"'),
+    ('string', r"(?s)'(?:[^'\\\n]|\\.)*'"),
+    ('long_string', r'(?s)\[(?P<string_level>=*)\[.*?\](?P=string_level)\]'),
+    ('name', r'[A-Za-z_]\w*'),
+    ('number', r'0[xX][0-9a-fA-F.]+(?:[pP][+-]?\d+)?|\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?'),
+    ('symbol', r'\.\.\.|\.\.|==|~=|<=|>=|::|//|<<|>>|[^\s\w]'),
+], skip=r'\s+')
+
+def _string_value(token)->str|None:
+    """Get the value of a short string token, or None if it has escapes that need decoding.
+    """
+    value = token.value[1:-1]
+    if '\\' in value:
+        return None
+    return value
+
+def find_string_calls(src:str, names:list[str])->list[str]|None:
+    """Find the string literals passed directly to calls of global functions.
+
+    Both `func("a", "b")` and `func "a"` forms are found, in source order.
+    Calls made through a table or method like `t.func("a")` are ignored.
+
+    Args:
+        src (str): Lua source code.
+        names (list[str]): Function names to look for.
+
+    Returns:
+        list[str]|None: The string arguments, or None if the source is ambiguous
+        and should be checked with a full parser instead.
+    """
+    try:
+        tokens = [token for token in lexer.tokens(src) if token.kind != 'comment']
+    except Exception:
+        return None
+    strings:list[str] = []
+    count = len(tokens)
+    for i, token in enumerate(tokens):
+        if token.kind != 'name' or token.value not in names:
+            continue
+        if i > 0 and tokens[i-1].value in ('.', ':', 'function'):
+            continue
+        if i + 1 >= count:
+            continue
+        call = tokens[i+1]
+        if call.kind == 'string':
+            value = _string_value(call)
+            if value is None:
+                return None
+            strings.append(value)
+        elif call.kind == 'long_string':
+            return None
+        elif call.kind == 'symbol' and call.value == '(':
+            # Split the arguments on top level commas, only lone strings count
+            depth = 0
+            arg = []
+            for tok in tokens[i+1:]:
+                if tok.kind == 'symbol' and tok.value in '([{':
+                    depth += 1
+                    if depth == 1: continue
+                elif tok.kind == 'symbol' and tok.value in ')]}':
+                    depth -= 1
+                if depth == 0 or (depth == 1 and tok.kind == 'symbol' and tok.value == ','):
+                    if len(arg) == 1 and arg[0].kind == 'string':
+                        value = _string_value(arg[0])
+                        if value is None:
+                            return None
+                        strings.append(value)
+                    elif len(arg) == 1 and arg[0].kind == 'long_string':
+                        return None
+                    arg = []
+                    if depth == 0: break
+                    continue
+                arg.append(tok)
+            else:
+                # Parentheses never closed
+                return None
+    return strings
+
+class DependencyGraph:
+    """Graph of which Lua scripts require which.
+
+    Scripts are added as they are reached and each one is only scanned once,
+    so closures over any number of scripts cost time linear in the graph size.
+    """
+    def __init__(self, get_requires:Callable[[str],list[str]]):
+        """
+        Args:
+            get_requires (Callable[[str],list[str]]): Function returning the scripts a script requires.
+        """
+        self.get_requires = get_requires
+        # Script key -> keys of the scripts it requires
+        self.edges:dict[str,list[str]] = {}
+        # Script key -> path as it was first given
+        self.paths:dict[str,str] = {}
+        # Missing script path -> paths of the scripts requiring it
+        self.unresolved:dict[str,list[str]] = {}
+
+    @staticmethod
+    def key(path:str)->str:
+        return os.path.normcase(os.path.abspath(path))
+
+    def _edges(self, key:str)->list[str]:
+        if key not in self.edges:
+            self.edges[key] = []
+            for required in self.get_requires(self.paths[key]):
+                required_key = self.key(required)
+                if not os.path.exists(required):
+                    self.unresolved.setdefault(required, []).append(self.paths[key])
+                    continue
+                self.paths.setdefault(required_key, required)
+                self.edges[key].append(required_key)
+        return self.edges[key]
+
+    def closure(self, scripts:Iterable[str])->list[str]:
+        """Get every script required by a set of scripts, directly or indirectly.
+
+        Cycles are followed only once. Scripts that can't be found are recorded in `unresolved`.
+
+        Args:
+            scripts (Iterable[str]): Scripts to start from.
+
+        Returns:
+            list[str]: Required script paths in the order they were found, not including `scripts`.
+        """
+        roots:list[str] = []
+        for script in scripts:
+            key = self.key(script)
+            self.paths.setdefault(key, script)
+            roots.append(key)
+        visited = set(roots)
+        found:list[str] = []
+        stack = list(reversed(roots))
+        while stack:
+            new:list[str] = []
+            for required in self._edges(stack.pop()):
+                if required not in visited:
+                    visited.add(required)
+                    found.append(self.paths[required])
+                    new.append(required)
+            stack.extend(reversed(new))
+        return found
@@ -3,6 +3,92 @@
 https://github.com/FrostSource/hla_extravaganza
 """
 import re
+from functools import lru_cache
+from typing import Iterator
+
+@lru_cache(maxsize=None)
+def compile_pattern(pattern:str|re.Pattern[str])->re.Pattern[str]:
+    """Compile a regex pattern once and reuse it for every later call.
+
+    Args:
+        pattern (str|re.Pattern[str]): The pattern, already compiled patterns are returned as is.
+
+    Returns:
+        re.Pattern[str]: The compiled pattern.
+    """
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    return re.compile(pattern)
+
+class Token:
+    """A single token matched by a `Tokenizer`."""
+    __slots__ = ('kind', 'match', 'line')
+    def __init__(self, kind:str, match:re.Match[str], line:int):
+        self.kind = kind
+        self.match = match
+        self.line = line
+
+    @property
+    def value(self)->str:
+        return self.match.group(0)
+
+    @property
+    def start(self)->int:
+        return self.match.start()
+
+    @property
+    def end(self)->int:
+        return self.match.end()
+
+    def __getitem__(self, group:int|str)->str|None:
+        return self.match.group(group)
+
+    def __repr__(self)->str:
+        return f'Token({self.kind}, {self.value!r}, line {self.line})'
+
+class Tokenizer:
+    """Splits strings into tokens using a list of regex rules.
+
+    Patterns are compiled once and matched in place, the first rule
+    to match at the current position becomes the next token.
+    Rules must never match an empty string.
+    """
+    def __init__(self, rules:list[tuple[str,str|re.Pattern[str]]], skip:str|re.Pattern[str]|None = None):
+        """
+        Args:
+            rules (list[tuple[str,str|re.Pattern[str]]]): Token kind and pattern pairs, tried in order.
+            skip (str|re.Pattern[str], optional): Pattern skipped before each token, e.g. whitespace.
+        """
+        self.rules = [(kind, compile_pattern(pattern)) for kind, pattern in rules]
+        self.skip = compile_pattern(skip) if skip is not None else None
+
+    def match(self, string:str, pos:int)->tuple[str,re.Match[str]]|None:
+        """Match the next token at a position without skipping anything.
+
+        Args:
+            string (str): String to match in.
+            pos (int): Position to match at.
+
+        Returns:
+            tuple[str,re.Match[str]]|None: The token kind and match, or None if no rule matches.
+        """
+        for kind, pattern in self.rules:
+            m = pattern.match(string, pos)
+            if m is not None and m.end() > pos:
+                return kind, m
+        return None
+
+    def tokens(self, string:str, pos:int = 0)->Iterator[Token]:
+        """Generate all tokens in a string.
+
+        Args:
+            string (str): String to tokenize.
+            pos (int, optional): Position to start at. Defaults to 0.
+
+        Returns:
+            Iterator[Token]: The tokens.
+        """
+        return StringParser(string, pos).tokenize(self)
 
 class StringParser:
     """Parse arbitary string data.
@@ -12,39 +98,118 @@ class StringParser:
     """
     whitespace_chars = [' ','\t','\n','\r']
     number_chars = ['1','2','3','4','5','6','7','8','9','0']
-    index = 0
-    line_num = 1
-    line_row = 1
-    _cache_stack:list[tuple[int,int,int]] = []
-    _cache_index = 0
-    _cache_line_num = 1
-    _cache_line_row = 1
-    def __init__(self, string:str):
+    def __init__(self, string:str, index:int = 0):
         self.string = string
-        # Used for debugging
-        self._sub_string = string
-    
-    def _save(self):
-        self._cache_stack.append((self.index, self.line_num, self.line_row))
-    
-    def _load(self):
-        self.index, self.line_num, self.line_row = self._pop()
-        self._sub_string = self.string[self.index:]
+        self.length = len(string)
+        self.index = 0
+        self.line_num = 1
+        self.line_row = 1
+        if index > 0:
+            self._advance(index)
+
+    @property
+    def _sub_string(self)->str:
+        """The remaining unparsed string. Used for debugging.
+
+        This is only sliced when accessed so it doesn't cost anything while parsing.
+        """
+        return self.string[self.index:]
     
-    def _pop(self):
-        return self._cache_stack.pop()
+    def mark(self)->int:
+        """Get a mark for the current position that can be returned to with `reset`.
+
+        Returns:
+            int: The mark.
+        """
+        return self.index
+
+    def reset(self, mark:int):
+        """Return to a position previously given by `mark`.
+
+        Args:
+            mark (int): The mark to return to.
+        """
+        if mark >= self.index:
+            self._advance(mark)
+            return
+        self.line_row -= self.string.count('\n', mark, self.index)
+        line_start = self.string.rfind('\n', 0, mark)
+        if line_start == -1:
+            # The first line is counted from 1
+            self.line_num = mark + 1
+        else:
+            self.line_num = mark - (line_start + 1)
+        self.index = mark
+
+    def _advance(self, index:int):
+        """Move the cursor forward to an index, updating the line tracking.
+
+        Args:
+            index (int): Index to move to. Must not be less than the current index.
+        """
+        newlines = self.string.count('\n', self.index, index)
+        if newlines > 0:
+            self.line_row += newlines
+            self.line_num = index - (self.string.rfind('\n', self.index, index) + 1)
+        else:
+            self.line_num += index - self.index
+        self.index = index
+
+    def _skip_chars(self, index:int, chars)->int:
+        """Find the first index from `index` that isn't one of `chars`.
+
+        Args:
+            index (int): Index to start from.
+            chars: Characters to skip.
+
+        Returns:
+            int: Index of the first character not in `chars`.
+        """
+        string = self.string
+        length = self.length
+        while index < length and string[index] in chars:
+            index += 1
+        return index
+
+    def _word_end(self, index:int, stop_at)->int:
+        """Find the first index from `index` that is one of `stop_at`.
+
+        Args:
+            index (int): Index to start from.
+            stop_at: Characters that end the word.
+
+        Returns:
+            int: Index of the first character in `stop_at`, or the string length.
+        """
+        string = self.string
+        length = self.length
+        while index < length and string[index] not in stop_at:
+            index += 1
+        return index
+
+    def _whitespace_end(self)->int:
+        """Get the index after any whitespace at the cursor without moving the cursor.
+
+        Returns:
+            int: Index of the first non-whitespace character.
+        """
+        return self._skip_chars(self.index, self.whitespace_chars)
     
     def finished(self)->bool:
-        return self.index >= len(self.string)
+        return self.index >= self.length
 
     def skip_whitespace(self, _except=[]):
         """Skip all whitespace and returns it.
         """
-        whitespace_chars = [x for x in self.whitespace_chars if x not in _except]
-        st = ''
-        while not self.finished() and self.current() in whitespace_chars:
-            st += self.__next()
-        return st
+        whitespace_chars = self.whitespace_chars
+        if _except:
+            whitespace_chars = [x for x in whitespace_chars if x not in _except]
+        start = self.index
+        end = self._skip_chars(start, whitespace_chars)
+        if end == start:
+            return ''
+        self._advance(end)
+        return self.string[start:end]
     
     def current(self):
         """Get the current char.
@@ -54,21 +219,6 @@ class StringParser:
         """
         if self.finished(): return ''
         return self.string[self.index]
-    
-    def __next(self)->str:
-        """Internal function for handling each character.
-
-        Returns:
-            str: Next character.
-        """
-        if self.string[self.index] == '\n':
-            self.line_row += 1
-            self.line_num = 0
-        else:
-            self.line_num += 1
-        self.index += 1
-        self._sub_string = self.string[self.index:]
-        return self.string[self.index-1]
 
     def next(self, count:int = 1)->str:
         """Move to the next character.
@@ -81,11 +231,10 @@ class StringParser:
         """
         if self.finished():
             raise Exception('Tried to access character past string bounds.')
-        _next_str = ''
-        while not self.finished() and count > 0:
-            _next_str += self.__next()
-            count -= 1
-        return _next_str
+        start = self.index
+        end = min(start + max(count, 0), self.length)
+        self._advance(end)
+        return self.string[start:end]
     
     def peek(self, count:int = 1, skip_whitespace = False)->str:
         """Peek at the next character(s).
@@ -97,11 +246,10 @@ class StringParser:
         Returns:
             str: Peeked character(s).
         """
-        self._save()
-        if skip_whitespace: self.skip_whitespace()
-        c = self.next(count)
-        self._load()
-        return c
+        start = self._whitespace_end() if skip_whitespace else self.index
+        if start >= self.length:
+            raise Exception('Tried to access character past string bounds.')
+        return self.string[start:start+count]
     
     def eat(self, strings:str|list[str]):
         """Eats a string or list of strings in order.
@@ -123,21 +271,16 @@ class StringParser:
         Raises:
             Exception: If no options match.
         """
-        match_found = False
         for string in strings:
-            self._save()
+            mark = self.mark()
             try:
                 self.eat(string)
-            except:
-                self._load()
-                continue
+            except Exception:
+                self.reset(mark)
             else:
-                self._pop()
-                match_found = True
-                break
-        if not match_found:
-            #TODO: Make this message easier to read
-            raise Exception(f'Expecting one of {strings}')
+                return
+        #TODO: Make this message easier to read
+        raise Exception(f'Expecting one of {strings}')
     
     def skip_word(self, string:str, skip_whitespace = True)->bool:
         """Skip an entire word if it's next.
@@ -149,54 +292,62 @@ class StringParser:
             bool: If the skip was successful.
         """
         if self.finished(): return False
-        self._save()
-        if skip_whitespace: self.skip_whitespace()
-        if self.string[self.index:self.index+len(string)] == string:
-            self.next(len(string))
-            self._pop()
+        start = self._whitespace_end() if skip_whitespace else self.index
+        if self.string.startswith(string, start):
+            self._advance(start + len(string))
             return True
-        else:
-            self._load()
-            return False
+        return False
     
     def get_word(self, stop_at:list[str] = whitespace_chars)->str:
         self.skip_whitespace()
-        word = ''
-        while self.peek() not in stop_at and not self.finished():
-            word += self.next()
-        return word
+        start = self.index
+        end = self._word_end(start, stop_at)
+        self._advance(end)
+        return self.string[start:end]
         
     def peek_word(self, stop_at:list[str] = whitespace_chars)->str:
-        self._save()
-        word = self.get_word(stop_at)
-        self._load()
-        return word
+        start = self._whitespace_end()
+        return self.string[start:self._word_end(start, stop_at)]
     
     def get_string(self, boundary_chars = ["'", '"']):
+        """Get the contents of a quoted string and move past it.
+
+        Args:
+            boundary_chars (list[str], optional): Characters that can open and close a string.
+
+        Returns:
+            str|None: The string contents, or None if the cursor isn't at a string.
+        """
         self.skip_whitespace()
         if self.current() in boundary_chars:
             boundary_char = self.current()
-            string = ''
-            while self.peek() != boundary_char:
-                string += self.next()
-            return string
+            start = self.index + 1
+            end = self.string.find(boundary_char, start)
+            if end == -1:
+                raise Exception(f"Expecting closing {boundary_char}")
+            self._advance(end + 1)
+            return self.string[start:end]
     
     def startswith(self, substr:str, skip_whitespace = True)->bool:
-        self._save()
-        if skip_whitespace: self.skip_whitespace()
-        ret = self.string[self.index:].startswith(substr)
-        self._load()
-        return ret
+        start = self._whitespace_end() if skip_whitespace else self.index
+        return self.string.startswith(substr, start)
 
     
     def get_number(self, allow_decimal = True, number_chars = number_chars, decimal_char = "."):
-        num = ''
         is_decimal = False
         self.skip_whitespace()
-        while self.current() in number_chars or (self.current() == decimal_char and allow_decimal):
-            if self.current() == decimal_char:
+        string = self.string
+        length = self.length
+        start = end = self.index
+        while end < length:
+            c = string[end]
+            if c == decimal_char and allow_decimal:
                 is_decimal = True
-            num += self.next()
+            elif c not in number_chars:
+                break
+            end += 1
+        self._advance(end)
+        num = string[start:end]
         if is_decimal:
             num = float(num)
         else:
@@ -205,35 +356,62 @@ class StringParser:
     
     def skip_line(self, count = 1):
         lines:list[str] = []
-        line = ''
+        string = self.string
         for x in range(count):
-            while not self.finished() and self.current() != '\n':
-                line += self.next()
-            lines.append(line)
-            line = ''
-            if self.finished(): break
-            self.next()
+            start = self.index
+            end = string.find('\n', start)
+            if end == -1:
+                self._advance(self.length)
+                lines.append(string[start:])
+                break
+            lines.append(string[start:end])
+            self._advance(end + 1)
             
         return '\n'.join(lines)
 
-    def regex(self, pattern:str)->re.Match[str]|None:
+    def regex(self, pattern:str|re.Pattern[str])->re.Match[str]|None:
         """Match a given regex pattern and move past it if found.
 
+        The pattern is compiled once and matched in place, so `^` and lookbehinds
+        see the whole string rather than just the remaining part.
+
         Args:
-            pattern (str): The pattern.
+            pattern (str|re.Pattern[str]): The pattern.
 
         Returns:
             re.Match[str]|None: The match object if found.
         """
-        self._save()
-        self.skip_whitespace()
-        m = re.match(pattern, self.string[self.index:])
-        if m is None:
-            self._load()
-        else:
-            self._pop()
-            self.index += len(m.group(0))
+        m = compile_pattern(pattern).match(self.string, self._whitespace_end())
+        if m is not None:
+            self._advance(m.end())
         return m
+
+    def tokenize(self, tokenizer:Tokenizer)->Iterator[Token]:
+        """Generate tokens from the current position, moving past each one as it's consumed.
+
+        Args:
+            tokenizer (Tokenizer): Tokenizer with the rules to match.
+
+        Raises:
+            Exception: If no rule matches at the current position.
+
+        Returns:
+            Iterator[Token]: The tokens.
+        """
+        skip = tokenizer.skip
+        while not self.finished():
+            if skip is not None:
+                m = skip.match(self.string, self.index)
+                if m is not None and m.end() > self.index:
+                    self._advance(m.end())
+                    if self.finished(): return
+            matched = tokenizer.match(self.string, self.index)
+            if matched is None:
+                raise Exception(f'Unexpected character {self.current()!r} on line {self.line_row}')
+            kind, m = matched
+            line = self.line_row
+            self._advance(m.end())
+            yield Token(kind, m, line)
     
     def __str__(self):
         return self.string[self.index:]
\ No newline at end of file
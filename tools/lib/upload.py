@@ -0,0 +1,533 @@
+"""Upload backends for the extravaganza toolset.
+
+Uploading goes through a small backend interface so the same upload loop
+can target Google Drive or a local folder that stands in for it offline.
+
+https://github.com/FrostSource/hla_extravaganza
+"""
+from abc import ABC, abstractmethod
+import os
+import shutil
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+
+from .util import file_hash
+
+def file_mimetype(file) -> str|None:
+    match os.path.splitext(file)[1]:
+        case '.fgd'|'.lua'|'.md'|'.py'|'.gitignore'|'.gitattributes'|'.bat'|'.yaml':
+            return 'text/plain'
+        case '.json'|'.code-snippets'|'.vrman'|'.vsndevts'|'.vmdl'|'.vmat'|'.rect':
+            return 'text/plain'
+        case _:
+            return None
+            # This is invalid apparently
+            # return 'application/vnd.google-apps.unknown'
+
+class RemoteFile:
+    """A file or folder on an upload backend."""
+    def __init__(self, id:str, name:str, size:int|None = None, md5:str|None = None, handle = None):
+        """
+        Args:
+            id (str): Backend specific id used to refer to the file.
+            name (str): Name of the file inside its folder.
+            size (int, optional): Size in bytes if the backend knows it.
+            md5 (str, optional): MD5 hex digest of the contents if the backend knows it.
+            handle (optional): Backend specific object for the file.
+        """
+        self.id = id
+        self.name = name
+        self.size = size
+        self.md5 = md5
+        self.handle = handle
+
+    def __repr__(self) -> str:
+        return f'RemoteFile({self.name}, {self.id})'
+
+class UploadBackend(ABC):
+    """Somewhere release assets can be uploaded to.
+
+    Files and folders are found by name inside a parent folder id, starting from `root_id`.
+    Every call that would be a round trip to a server increments `requests`.
+    `upload_file` may be called from several threads at once, everything else is only called from one.
+    """
+    # Shown in messages about the upload
+    name = 'Upload backend'
+    # Errors that mean the connection should be made again and the upload retried
+    retry_errors:tuple[type[Exception], ...] = ()
+
+    def __init__(self, root_id:str):
+        self.root_id = root_id
+        self.requests = 0
+        self._requests_lock = threading.Lock()
+
+    def _count_request(self):
+        with self._requests_lock:
+            self.requests += 1
+
+    def connect(self):
+        """Authorize or open the backend. Called before uploading."""
+        pass
+
+    def reset(self):
+        """Forget any saved authorization after one of `retry_errors`."""
+        pass
+
+    def list_folders(self) -> list[tuple[str,RemoteFile]]|None:
+        """List every folder under the root in as few requests as possible.
+
+        Returns:
+            list[tuple[str,RemoteFile]]|None: Parent id and folder pairs, or None if the backend can't list them all at once.
+        """
+        return None
+
+    @abstractmethod
+    def find_folder(self, parent_id:str, name:str) -> RemoteFile|None:
+        """Find a folder by name inside a folder."""
+
+    @abstractmethod
+    def create_folder(self, parent_id:str, name:str) -> RemoteFile:
+        """Create a folder inside a folder."""
+
+    @abstractmethod
+    def find_file(self, parent_id:str, name:str) -> RemoteFile|None:
+        """Find a file, not folder, by name inside a folder."""
+
+    @abstractmethod
+    def list_files(self, parent_id:str) -> list[RemoteFile]:
+        """List the files, not folders, inside a folder with a single request."""
+
+    @abstractmethod
+    def upload_file(self, parent_id:str, name:str, path:Path, existing:RemoteFile|None = None) -> RemoteFile:
+        """Upload a local file, replacing the contents of `existing` if given.
+
+        Args:
+            parent_id (str): Folder to upload into.
+            name (str): Name of the uploaded file.
+            path (Path): Local file to upload.
+            existing (RemoteFile, optional): File found with `find_file` to overwrite.
+
+        Returns:
+            RemoteFile: The uploaded file.
+        """
+
+class DriveBackend(UploadBackend):
+    """Uploads to a Google Drive folder using pydrive.
+
+    pydrive is only imported when this backend is created so it isn't needed for anything else.
+    """
+    name = 'Google Drive'
+    folder_mimetype = 'application/vnd.google-apps.folder'
+
+    def __init__(self, root_id:str, credentials_file:str = 'credentials.json'):
+        super().__init__(root_id)
+        from pydrive.auth import GoogleAuth, RefreshError
+        from pydrive.drive import GoogleDrive
+        self._GoogleAuth = GoogleAuth
+        self._GoogleDrive = GoogleDrive
+        self.retry_errors = (RefreshError,)
+        self.credentials_file = credentials_file
+        self.gauth = None
+        self.drive = None
+        # pydrive's http connection can't be shared between threads so each upload thread authorizes its own
+        self._thread = threading.local()
+
+    def connect(self):
+        gauth = self._GoogleAuth()
+        if gauth.credentials is None:
+            print('Google Drive waiting for authorization...')
+            gauth.LocalWebserverAuth()
+        elif gauth.access_token_expired:
+            print('Google Drive token expired, refreshing...')
+            gauth.Refresh()
+        else:
+            gauth.Authorize()
+        gauth.SaveCredentialsFile(self.credentials_file)
+        self.gauth = gauth
+        self.drive = self._GoogleDrive(gauth)
+        self._thread = threading.local()
+
+    def _thread_drive(self):
+        if threading.current_thread() is threading.main_thread():
+            return self.drive
+        if getattr(self._thread, 'drive', None) is None:
+            gauth = self._GoogleAuth()
+            gauth.credentials = self.gauth.credentials
+            gauth.Authorize()
+            self._thread.drive = self._GoogleDrive(gauth)
+        return self._thread.drive
+
+    def reset(self):
+        if os.path.exists(self.credentials_file):
+            os.remove(self.credentials_file)
+
+    def _remote(self, gfile) -> RemoteFile:
+        size = gfile.get('fileSize')
+        return RemoteFile(gfile['id'], gfile['title'], int(size) if size is not None else None, gfile.get('md5Checksum'), gfile)
+
+    # Most parent folders put in one query, kept short enough for Drive to accept
+    parents_per_query = 50
+
+    def _query(self, q:str) -> list:
+        files = []
+        # Results come back a page at a time and each page is its own request
+        for page in self.drive.ListFile({'q': q, 'maxResults': 1000}):
+            self._count_request()
+            files.extend(page)
+        return files
+
+    def list_folders(self) -> list[tuple[str,RemoteFile]]|None:
+        """List the folders under the root a level at a time, each level with as few queries as the number of folders in it allows."""
+        folders = []
+        level = [self.root_id]
+        # Drive folders can have more than one parent so each is only walked once
+        seen = {self.root_id}
+        while level:
+            next_level = []
+            for i in range(0, len(level), self.parents_per_query):
+                batch = level[i:i+self.parents_per_query]
+                in_batch = set(batch)
+                parents = ' or '.join(f"'{id}' in parents" for id in batch)
+                for gfile in self._query(f"mimeType='{self.folder_mimetype}' and trashed=false and ({parents})"):
+                    for parent in gfile.get('parents', []):
+                        if parent['id'] in in_batch:
+                            folders.append((parent['id'], self._remote(gfile)))
+                    if gfile['id'] not in seen:
+                        seen.add(gfile['id'])
+                        next_level.append(gfile['id'])
+            level = next_level
+        return folders
+
+    def find_folder(self, parent_id:str, name:str) -> RemoteFile|None:
+        file_list = self._query(f"title='{name}' and '{parent_id}' in parents and mimeType='{self.folder_mimetype}' and trashed=false")
+        return self._remote(file_list[0]) if file_list else None
+
+    def create_folder(self, parent_id:str, name:str) -> RemoteFile:
+        gfile = self.drive.CreateFile({
+            'title': name,
+            'parents': [{'id': parent_id}],
+            'mimeType': self.folder_mimetype
+        })
+        self._count_request()
+        gfile.Upload()
+        return self._remote(gfile)
+
+    def find_file(self, parent_id:str, name:str) -> RemoteFile|None:
+        file_list = self._query(f"title='{name}' and '{parent_id}' in parents and trashed=false")
+        return self._remote(file_list[0]) if file_list else None
+
+    def list_files(self, parent_id:str) -> list[RemoteFile]:
+        return [self._remote(gfile) for gfile in self._query(f"'{parent_id}' in parents and mimeType!='{self.folder_mimetype}' and trashed=false")]
+
+    def upload_file(self, parent_id:str, name:str, path:Path, existing:RemoteFile|None = None) -> RemoteFile:
+        drive = self._thread_drive()
+        if existing is None:
+            gfile = drive.CreateFile({
+                'title': name,
+                'parents': [{'id': parent_id}],
+            })
+        else:
+            # Files with an id are updated instead of created
+            gfile = drive.CreateFile({'id': existing.id, 'title': name})
+        if mime := file_mimetype(name):
+            gfile['mimeType'] = mime
+        gfile.SetContentFile(str(path))
+        self._count_request()
+        gfile.Upload()
+        return self._remote(gfile)
+
+class LocalBackend(UploadBackend):
+    """Uploads into a folder on disk, standing in for a server when testing or benchmarking.
+
+    Ids are folder paths relative to the root folder.
+    Requests can be made to fail so retrying and resuming can be tried without a server.
+    """
+    class RetryError(Exception):
+        """Stands in for a server error like an expired token."""
+
+    name = 'Upload folder'
+    retry_errors = (RetryError,)
+
+    def __init__(self, path, latency:float = 0.0, fail_after:int|None = None, fail_rate:float = 0.0, seed:int|None = None):
+        """
+        Args:
+            path (str|Path): Folder that is uploaded into, created if it doesn't exist.
+            latency (float, optional): Seconds each request waits to act like a round trip to a server. Defaults to 0.
+            fail_after (int, optional): Number of requests that succeed before one fails with `RetryError`, only fails once.
+            fail_rate (float, optional): Chance of each request failing with `RetryError`. Defaults to 0.
+            seed (int, optional): Seed for `fail_rate` so failures can be repeated.
+        """
+        super().__init__('')
+        self.path = Path(path)
+        self.latency = latency
+        self.fail_after = fail_after
+        self.fail_rate = fail_rate
+        self._random = random.Random(seed)
+        self._fail_lock = threading.Lock()
+        self._succeeded = 0
+
+    def _request(self):
+        self._count_request()
+        if self.latency > 0:
+            time.sleep(self.latency)
+        with self._fail_lock:
+            if self._succeeded == self.fail_after:
+                self.fail_after = None
+                fail = True
+            else:
+                fail = self.fail_rate > 0 and self._random.random() < self.fail_rate
+            if not fail:
+                self._succeeded += 1
+        if fail:
+            raise LocalBackend.RetryError(f'Simulated failure after {self._succeeded} successful requests')
+
+    def _local(self, id:str) -> Path:
+        return self.path.joinpath(id)
+
+    def _remote(self, parent_id:str, name:str) -> RemoteFile:
+        id = str(PurePosixPath(parent_id, name))
+        local = self._local(id)
+        if local.is_dir():
+            return RemoteFile(id, name)
+        return RemoteFile(id, name, local.stat().st_size, file_hash(local, 'md5'))
+
+    def connect(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def list_folders(self) -> list[tuple[str,RemoteFile]]|None:
+        self._request()
+        folders = []
+        for root, dirs, files in os.walk(self.path):
+            parent_id = Path(root).relative_to(self.path).as_posix()
+            if parent_id == '.':
+                parent_id = ''
+            for folder in dirs:
+                folders.append((parent_id, self._remote(parent_id, folder)))
+        return folders
+
+    def find_folder(self, parent_id:str, name:str) -> RemoteFile|None:
+        self._request()
+        if self._local(parent_id).joinpath(name).is_dir():
+            return self._remote(parent_id, name)
+        return None
+
+    def create_folder(self, parent_id:str, name:str) -> RemoteFile:
+        self._request()
+        self._local(parent_id).joinpath(name).mkdir(exist_ok=True)
+        return self._remote(parent_id, name)
+
+    def find_file(self, parent_id:str, name:str) -> RemoteFile|None:
+        self._request()
+        if self._local(parent_id).joinpath(name).is_file():
+            return self._remote(parent_id, name)
+        return None
+
+    def list_files(self, parent_id:str) -> list[RemoteFile]:
+        self._request()
+        return [self._remote(parent_id, entry.name) for entry in os.scandir(self._local(parent_id)) if entry.is_file()]
+
+    def upload_file(self, parent_id:str, name:str, path:Path, existing:RemoteFile|None = None) -> RemoteFile:
+        self._request()
+        shutil.copyfile(path, self._local(parent_id).joinpath(name))
+        return self._remote(parent_id, name)
+
+class RemoteTree:
+    """Remembers the folders and files found on a backend so each is only looked up once.
+
+    The whole folder tree is listed up front when the backend supports it, otherwise
+    folders are looked up as they are needed. Either way every folder is found or
+    created once and the files in it are listed with one request, so uploading costs
+    requests for each folder instead of for each file.
+    """
+    def __init__(self, backend:UploadBackend):
+        self.backend = backend
+        # Folder path relative to the root -> folder id
+        self.folders:dict[PurePosixPath,str] = {PurePosixPath(): backend.root_id}
+        # Folder id -> file name -> file
+        self.files:dict[str,dict[str,RemoteFile]] = {}
+        # If every existing folder is in `folders`, so missing ones can be created without looking first
+        self.complete = False
+
+    def load_folders(self):
+        """List every folder on the backend under the root, if the backend can."""
+        listing = self.backend.list_folders()
+        if listing is None:
+            return
+        children:dict[str,list[RemoteFile]] = {}
+        for parent_id, folder in listing:
+            children.setdefault(parent_id, []).append(folder)
+        stack = [PurePosixPath()]
+        while stack:
+            path = stack.pop()
+            for folder in children.get(self.folders[path], []):
+                # Only the first folder with a name is used, same as looking it up
+                if path / folder.name not in self.folders:
+                    self.folders[path / folder.name] = folder.id
+                    stack.append(path / folder.name)
+        self.complete = True
+
+    def folder_id(self, path:PurePosixPath) -> str:
+        """Get the id of a folder, creating it and any parent folders that don't exist.
+
+        Args:
+            path (PurePosixPath): Folder path relative to the root.
+
+        Returns:
+            str: The folder id.
+        """
+        if path in self.folders:
+            return self.folders[path]
+        parent_id = self.folder_id(path.parent)
+        folder = None
+        if not self.complete:
+            folder = self.backend.find_folder(parent_id, path.name)
+        if folder is None:
+            folder = self.backend.create_folder(parent_id, path.name)
+            # New folders are empty so there's nothing to list
+            self.files[folder.id] = {}
+        self.folders[path] = folder.id
+        return folder.id
+
+    def find_file(self, folder_id:str, name:str) -> RemoteFile|None:
+        """Get a file in a folder, listing the folder the first time it's used.
+
+        Args:
+            folder_id (str): Folder the file is in.
+            name (str): Name of the file.
+
+        Returns:
+            RemoteFile|None: The file, or None if it doesn't exist.
+        """
+        if folder_id not in self.files:
+            listing:dict[str,RemoteFile] = {}
+            for file in self.backend.list_files(folder_id):
+                listing.setdefault(file.name, file)
+            self.files[folder_id] = listing
+        return self.files[folder_id].get(name)
+
+class UploadJournal:
+    """Record of the files uploaded so far, so an interrupted upload only sends what is still outstanding.
+
+    Each uploaded file is appended as a line of JSON as soon as it's done.
+    The journal is removed once every file has been uploaded.
+    """
+    def __init__(self, path, root_id:str):
+        """
+        Args:
+            path (str|Path): The journal file.
+            root_id (str): Root of the backend being uploaded to, journals for other roots are ignored.
+        """
+        self.path = Path(path)
+        self.root_id = root_id
+        self._file = None
+        self._lock = threading.Lock()
+
+    def load(self) -> dict[str,str]:
+        """Load the files recorded by an unfinished upload.
+
+        Returns:
+            dict[str,str]: MD5 hex digest of each uploaded file by its remote path.
+        """
+        done:dict[str,str] = {}
+        if not self.path.exists():
+            return done
+        try:
+            with open(self.path, 'r') as f:
+                if json.loads(f.readline()).get('root') != self.root_id:
+                    return {}
+                for line in f:
+                    entry = json.loads(line)
+                    done[entry['path']] = entry['md5']
+        except (OSError, ValueError, KeyError):
+            # A line cut off by a crash ends the journal
+            pass
+        return done
+
+    def record(self, rel:PurePosixPath, md5:str):
+        with self._lock:
+            if self._file is None:
+                new = not self.path.exists()
+                self._file = open(self.path, 'a')
+                if new:
+                    self._file.write(json.dumps({'root': self.root_id}) + '\n')
+            self._file.write(json.dumps({'path': str(rel), 'md5': md5}) + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def finish(self):
+        self.close()
+        if self.path.exists():
+            os.remove(self.path)
+
+def upload_files(backend:UploadBackend, files:list[tuple[Path,PurePosixPath]], jobs:int = 1, journal_path = None, known_hashes:dict[str,str]|None = None) -> tuple[int,int]:
+    """Upload files to a backend, creating any folders they need.
+
+    Files whose remote copy already has the same size and MD5 are skipped.
+    Folders are found or created first, then files are uploaded on up to `jobs` threads.
+
+    Args:
+        backend (UploadBackend): Connected backend.
+        files (list[tuple[Path,PurePosixPath]]): Local files and their paths relative to the backend root.
+        jobs (int, optional): Number of files uploaded at once. Defaults to 1.
+        journal_path (str|Path, optional): Journal file used to resume an interrupted upload.
+        known_hashes (dict[str,str], optional): MD5 of files already known to be current, by relative path.
+            Only files not in here are read and hashed.
+
+    Returns:
+        tuple[int,int]: Number of files uploaded and number skipped because they were unchanged.
+    """
+    journal = UploadJournal(journal_path, backend.root_id) if journal_path is not None else None
+    done = journal.load() if journal is not None else {}
+    if journal is not None and not done and journal.path.exists():
+        # Left over from a different root, or nothing was uploaded before it stopped
+        os.remove(journal.path)
+
+    known_hashes = known_hashes or {}
+    def hash_file(file:tuple[Path,PurePosixPath]) -> str:
+        known = known_hashes.get(str(file[1]))
+        return known if known is not None else file_hash(file[0], 'md5')
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        hashes = list(executor.map(hash_file, files))
+
+    unchanged = 0
+    tree = RemoteTree(backend)
+    tree.load_folders()
+    pending:list[tuple[Path,PurePosixPath,str,str,RemoteFile|None]] = []
+    for (path, rel), md5 in zip(files, hashes):
+        if done.get(str(rel)) == md5:
+            unchanged += 1
+            continue
+        folder_id = tree.folder_id(rel.parent)
+        existing = tree.find_file(folder_id, rel.name)
+        if existing is not None and existing.md5 == md5 and existing.size == path.stat().st_size:
+            unchanged += 1
+            continue
+        pending.append((path, rel, md5, folder_id, existing))
+
+    def upload(item) -> PurePosixPath:
+        path, rel, md5, folder_id, existing = item
+        backend.upload_file(folder_id, rel.name, path, existing)
+        if journal is not None:
+            journal.record(rel, md5)
+        return rel
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for rel in executor.map(upload, pending):
+                print(f'  Uploaded "{rel}"')
+    finally:
+        if journal is not None:
+            journal.close()
+    if journal is not None:
+        journal.finish()
+    return len(pending), unchanged
@@ -1,6 +1,9 @@
 # https://stackoverflow.com/a/24519338/15190248
 import re
 import codecs
+import hashlib
+import itertools
+from collections import deque
 
 ESCAPE_SEQUENCE_RE = re.compile(r'''
     ( \\U........      # 8-digit hex escapes
@@ -34,4 +37,44 @@ def print_dict(d:dict):
     for k,v in d.items():
         print(str(k) + ':')
         if isinstance(v, list): print_list(v, '\t')
-        else: print(f'\t{v}')
\ No newline at end of file
+        else: print(f'\t{v}')
+
+
+def file_hash(path, algorithm:str = 'sha1') -> str:
+    """Gets the hex digest of a file's contents.
+
+    Args:
+        path (str|Path): Path to the file.
+        algorithm (str, optional): Any hashlib algorithm name. Defaults to 'sha1'.
+
+    Returns:
+        str: Hex digest of the file.
+    """
+    h = hashlib.new(algorithm)
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def bounded_map(executor, fn, items, *args, ahead:int = 1):
+    """Like `executor.map` but only submits a limited number of items ahead of the results read.
+
+    `executor.map` submits every item up front, holding all of their results in memory
+    until they are read.
+
+    Args:
+        executor (Executor): Executor to run `fn` on.
+        fn (Callable): Called with each item followed by `args`.
+        items (Iterable): Items to call `fn` with.
+        ahead (int, optional): Most items submitted but not yet read. Defaults to 1.
+
+    Yields:
+        tuple: Each item and its result, in order.
+    """
+    items = iter(items)
+    pending = deque((item, executor.submit(fn, item, *args)) for item in itertools.islice(items, max(ahead, 1)))
+    while pending:
+        item, future = pending.popleft()
+        for queued in itertools.islice(items, 1):
+            pending.append((queued, executor.submit(fn, queued, *args)))
+        yield item, future.result()
@@ -7,22 +7,25 @@ from pathlib import Path
 import re
 # Better way to import relative module? Python seems to be dumb
 if __name__ == '__main__':
-    from lib.parsing import StringParser
+    from lib.parsing import StringParser, Tokenizer
 else:
-    from .lib.parsing import StringParser
+    from .lib.parsing import StringParser, Tokenizer
 
 file_template = '''## {} ({})\n\n{}\n\n'''
 table_template = '''<table><tr><td><b>Function</b></td><td><b>Description</b></td></tr>{}</table>'''
 function_template = '''<tr><td>\n\n`{}`</td><td>{}</td></tr>'''
 
 def parse_multiline_comment(parser:StringParser)->str:
-    comment = ''
     if not parser.skip_word('--[['):
         return ''
-    
-    while not parser.skip_word(']]'):
-        comment += parser.next()
-    return comment
+
+    end = parser.string.find(']]', parser.index)
+    if end == -1:
+        raise Exception("Expecting ']]'")
+    comment = parser.next(end - parser.index) if end > parser.index else ''
+    parser.eat(']]')
+    # Whitespace before the closing brackets is not part of the comment
+    return comment.rstrip(''.join(parser.whitespace_chars))
 
 def whitespace_count(whitespace:str)->tuple[int,int,int]:
     """Returns the number of spaces, tabs, newlines in a string.
@@ -235,6 +238,21 @@ regex_function = combine(
     combine2(r'\(', optional(capture('params', combine2(eitheror(regex_identifier,'\.\.\.') + zeroormore(combine2(r',', eitheror(regex_identifier,'\.\.\.')))) )), r'\)')
 )
 
+# Whitespace before a keyword may span lines, the rest of a keyword's line is always consumed
+regex_leading_whitespace = r'[ \t\r\n]*'
+regex_rest_of_line = r'[^\n]*\n?'
+lua_tokenizer = Tokenizer([
+    ('blank', r'\n'),
+    ('param', regex_leading_whitespace + r'---@param ' + regex_leading_whitespace + regex_param + regex_rest_of_line),
+    ('return', regex_leading_whitespace + r'---@return ' + regex_leading_whitespace + regex_return + regex_rest_of_line),
+    ('generic', regex_leading_whitespace + r'---@generic ' + regex_rest_of_line),
+    ('ignore', regex_leading_whitespace + r'---@luadoc-ignore' + regex_rest_of_line),
+    ('tag', regex_leading_whitespace + r'---@' + regex_rest_of_line),
+    ('doc', regex_leading_whitespace + r'---(?P<doc>[^\n]*)\n?'),
+    ('function', regex_leading_whitespace + r'function ' + regex_leading_whitespace + optional(regex_function) + regex_rest_of_line),
+    ('line', regex_rest_of_line),
+])
+
 def parse_lua_file(file:str)->tuple[list[LuaFunction],str,str]:
     with open(file, 'r') as f:
         src = f.read()
@@ -256,66 +274,51 @@ def parse_lua_file(file:str)->tuple[list[LuaFunction],str,str]:
     functions:list[LuaFunction] = []
 
     luadoc_ignore = False
-    
-    while not parser.finished():
-        if parser.peek() == '\n':
-            parser.next()
-            current_params.clear()
-            current_returns.clear()
-            current_doclines.clear()
-            is_generic = False
-
-        if parser.skip_word('---@param '):
-            param = parser.regex(regex_param)
-            current_params.append(LuaParam(
-                param.group('name'),
-                param.group('types').split('|'),
-                (param.group('name_optional') is not None) or (param.group('types_optional') is not None),
-                param.group('comment')
-            ))
-            parser.skip_line()
-            
-        elif parser.skip_word('---@return '):
-            returns = parser.regex(regex_return)
-            current_returns.append(LuaReturn(
-                returns.group('types').split('|'),
-                returns.group('name'),
-                (returns.group('name_optional') is not None) or (returns.group('types_optional') is not None),
-                returns.group('comment')
-            ))
-            parser.skip_line()
-            
-        elif parser.skip_word('---@generic '):
-            parser.regex(regex_generic)
-            is_generic = True
-            parser.skip_line()
-
-        elif parser.skip_word('---@luadoc-ignore'):
-            luadoc_ignore = True
-            parser.skip_line()
-
-        elif parser.skip_word('---@'):
-            parser.skip_line()
-
-        elif parser.skip_word('---'):
-            line = parser.skip_line()
-            current_doclines.append(line)
-
-        elif parser.skip_word('function '):
-            if luadoc_ignore:
-                luadoc_ignore = False
-                parser.skip_line()
-                continue
-            func = parser.regex(regex_function)
-            functions.append(LuaFunction(func.group('name'), current_params, current_returns, is_generic, current_doclines))
-            current_params.clear()
-            current_returns.clear()
-            current_doclines.clear()
-            is_generic = False
-            parser.skip_line()
 
-        else:
-            parser.skip_line()
+    for token in parser.tokenize(lua_tokenizer):
+        match token.kind:
+            case 'blank':
+                current_params.clear()
+                current_returns.clear()
+                current_doclines.clear()
+                is_generic = False
+
+            case 'param':
+                current_params.append(LuaParam(
+                    token['name'],
+                    token['types'].split('|'),
+                    (token['name_optional'] is not None) or (token['types_optional'] is not None),
+                    token['comment']
+                ))
+
+            case 'return':
+                current_returns.append(LuaReturn(
+                    token['types'].split('|'),
+                    token['name'],
+                    (token['name_optional'] is not None) or (token['types_optional'] is not None),
+                    token['comment']
+                ))
+
+            case 'generic':
+                is_generic = True
+
+            case 'ignore':
+                luadoc_ignore = True
+
+            case 'doc':
+                current_doclines.append(token['doc'])
+
+            case 'function':
+                if luadoc_ignore:
+                    luadoc_ignore = False
+                    continue
+                if token['name'] is None:
+                    raise Exception(f'Could not parse function name on line {token.line} of {file}')
+                functions.append(LuaFunction(token['name'], current_params, current_returns, is_generic, current_doclines))
+                current_params.clear()
+                current_returns.clear()
+                current_doclines.clear()
+                is_generic = False
 
     return functions, header, version
 
@@ -4,43 +4,76 @@ https://github.com/FrostSource/hla_extravaganza
 """
 
 from pathlib import Path
-from lib.parsing import StringParser
+from lib.parsing import StringParser, Tokenizer
 from PIL import Image, ImageDraw
 
 
+kv3_tokenizer = Tokenizer([
+    ('number', r'-?\d+'),
+    ('identifier', r'[A-Za-z_]\w*'),
+    ('symbol', r'[{}\[\]=,]'),
+], skip=r'\s+')
+
 def parse_rect_file(rect: Path):
+    def next_token():
+        token = next(tokens, None)
+        if token is None:
+            raise Exception('Unexpected end of file')
+        return token
+
+    def eat(*values:str):
+        for value in values:
+            token = next_token()
+            if token.value != value:
+                raise Exception(f"Expecting '{value}' on line {token.line}")
+
+    def number():
+        token = next_token()
+        if token.kind != 'number':
+            raise Exception(f'Expecting number on line {token.line}')
+        return int(token.value)
+
+    def vector():
+        eat("[")
+        x = number()
+        eat(",")
+        y = number()
+        eat("]")
+        return (x,y)
+
     def rectangle():
-        sp.skip_line()
-        sp.eat(["min","=","["])
-        rect_min = []
-        rect_min.append(sp.get_number(allow_decimal=False))
-        sp.eat(",")
-        rect_min.append(sp.get_number(allow_decimal=False))
-        sp.eat("]")
-        sp.eat(["max","=","["])
-        rect_max = []
-        rect_max.append(sp.get_number(allow_decimal=False))
-        sp.eat(",")
-        rect_max.append(sp.get_number(allow_decimal=False))
-        sp.eat("]")
-        sp.either(
-            ["properties","=","null"],
-            ["properties","=","{","allowRotation","=","true","}"],
-            ["properties","=","{","allowRotation","=","false","}"]
-        )
-        sp.skip_line(2)
-        return ((rect_min[0],rect_min[1]),(rect_max[0],rect_max[1]))
+        eat("min","=")
+        rect_min = vector()
+        eat("max","=")
+        rect_max = vector()
+        eat("properties","=")
+        token = next_token()
+        if token.value == "{":
+            eat("allowRotation","=")
+            token = next_token()
+            if token.value not in ("true","false"):
+                raise Exception(f"Expecting 'true' or 'false' on line {token.line}")
+            eat("}")
+        elif token.value != "null":
+            raise Exception(f"Expecting 'null' or properties on line {token.line}")
+        eat("}")
+        return (rect_min,rect_max)
 
     sp = StringParser(rect.read_text())
     shapes = []
     max_size = (0,0)
     if sp.startswith("<!-- kv3"):
         sp.skip_line(9)
-        while sp.startswith("{"):
+        tokens = sp.tokenize(kv3_tokenizer)
+        token = next(tokens, None)
+        while token is not None and token.value == "{":
             r = rectangle()
             print(r)
             max_size = (max(max_size[0],r[1][0]),max(max_size[1],r[1][1]))
             shapes.append(r)
+            token = next(tokens, None)
+            if token is not None and token.value == ",":
+                token = next(tokens, None)
         print(len(shapes))
         print(max_size)
         return shapes, max_size
@@ -0,0 +1,270 @@
+"""Finds which maps use a string, such as an entity class, targetname, model or script.
+
+Every string in the DMX string table of each .vmap, along with its asset references,
+is kept in an index file at the addon root. Maps are only read again when their
+modified time or size changes, and the index is memory mapped and binary searched
+so looking up a string doesn't load the whole thing.
+
+Run from the addon root:
+    python -m tools.vmap_index [--search] [--rebuild] [--time] [string ...]
+
+https://github.com/FrostSource/hla_extravaganza
+"""
+import argparse
+import bisect
+import json
+import mmap
+import os
+from pathlib import Path
+import struct
+import time
+
+import tools.lib.addon as addon
+from tools.lib.dmx import DmxError, DmxReader
+
+index_path = addon.root.joinpath('.vmap_index.bin')
+# Folder searched for maps, relative to the content folder
+maps_folder = 'maps'
+
+# Bumped whenever the layout or what gets indexed changes
+_magic = b'VMAPIDX\0'
+_version = 2
+_header = struct.Struct('<8sII')
+_uint = struct.Struct('<I')
+
+def read_map_strings(path:str)->list[str]:
+    """Get the strings a map is indexed by.
+
+    Args:
+        path (str): The .vmap file.
+
+    Returns:
+        list[str]: Unique strings, empty if the map isn't binary DMX.
+    """
+    try:
+        with DmxReader(path) as reader:
+            return list(dict.fromkeys(reader.strings() + reader.asset_references()))
+    except DmxError as e:
+        print(f'Skipping {e}')
+        return []
+
+class VmapIndex:
+    """Inverted index from strings to the maps containing them.
+
+    The file is laid out as a header, a JSON block of the indexed maps and folders
+    with their stat signatures, a table of offsets to every entry sorted by string,
+    and the entries themselves, each a string followed by the numbers of the maps using it.
+    Lengths, counts and map numbers are all 32 bit so there's no limit on strings or maps.
+    """
+    def __init__(self, path:Path = index_path):
+        self.path = path
+        self._data:mmap.mmap|None = None
+        # Map paths relative to the content folder -> [mtime, size]
+        self.files:dict[str,list[int]] = {}
+        # Folder paths relative to the content folder -> mtime
+        self.folders:dict[str,int] = {}
+        self._count = 0
+        self._offsets_start = 0
+        self._map_names:list[str] = []
+
+    def open(self)->bool:
+        """Map the index file into memory.
+
+        Returns:
+            bool: If an index of the current version was found.
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+        magic, version, meta_size = _header.unpack_from(self._data, 0)
+        if magic != _magic or version != _version:
+            self.close()
+            return False
+        pos = _header.size
+        meta = json.loads(self._data[pos:pos+meta_size])
+        self.files = meta['files']
+        self.folders = meta['folders']
+        self._map_names = list(self.files)
+        pos += meta_size
+        self._count = _uint.unpack_from(self._data, pos)[0]
+        self._offsets_start = pos + _uint.size
+        return True
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+
+    def _entry(self, i:int)->tuple[bytes,int]:
+        """Get the string of an entry and where its map numbers start."""
+        offset = _uint.unpack_from(self._data, self._offsets_start + i * _uint.size)[0]
+        size = _uint.unpack_from(self._data, offset)[0]
+        offset += _uint.size
+        return self._data[offset:offset+size], offset + size
+
+    def _maps(self, pos:int)->list[str]:
+        count = _uint.unpack_from(self._data, pos)[0]
+        numbers = struct.unpack_from(f'<{count}I', self._data, pos + _uint.size)
+        return [self._map_names[n] for n in numbers]
+
+    def lookup(self, string:str)->list[str]:
+        """Get the maps containing a string exactly.
+
+        Args:
+            string (str): The string, case sensitive.
+
+        Returns:
+            list[str]: Map paths relative to the content folder.
+        """
+        if self._data is None: return []
+        key = string.encode()
+        i = bisect.bisect_left(range(self._count), key, key=lambda i: self._entry(i)[0])
+        if i < self._count:
+            found, pos = self._entry(i)
+            if found == key:
+                return self._maps(pos)
+        return []
+
+    def items(self):
+        """Iterate over every string and the maps containing it, in sorted order."""
+        if self._data is None: return
+        for i in range(self._count):
+            key, pos = self._entry(i)
+            yield key.decode(), self._maps(pos)
+
+    def search(self, text:str)->dict[str,list[str]]:
+        """Get the maps containing any string with some text in it.
+
+        Args:
+            text (str): Text to find, case insensitive.
+
+        Returns:
+            dict[str,list[str]]: Maps by each matching string.
+        """
+        text = text.lower()
+        return {string: maps for string, maps in self.items() if text in string.lower()}
+
+    def is_up_to_date(self)->bool:
+        """Get if no indexed map or folder has changed since the index was written.
+
+        Adding or removing a map changes the modified time of its folder
+        so the maps folder doesn't need to be searched again.
+        """
+        if self._data is None: return False
+        try:
+            for folder, mtime in self.folders.items():
+                if os.stat(addon.content_path.joinpath(folder)).st_mtime_ns != mtime:
+                    return False
+            for file, signature in self.files.items():
+                stat = os.stat(addon.content_path.joinpath(file))
+                if [stat.st_mtime_ns, stat.st_size] != signature:
+                    return False
+        except OSError:
+            return False
+        return True
+
+    def update(self, rebuild:bool = False)->tuple[int,int]:
+        """Read any maps that are new or changed since the index was written, and write it again.
+
+        Args:
+            rebuild (bool, optional): Read every map even if it hasn't changed. Defaults to False.
+
+        Returns:
+            tuple[int,int]: The number of maps read and the number removed.
+        """
+        # Strings of every map still indexed and unchanged, recovered from the index itself
+        strings:dict[str,list[str]] = {}
+        if not rebuild:
+            strings = {file: [] for file in self.files}
+            for string, maps in self.items():
+                for file in maps:
+                    strings[file].append(string)
+        self.close()
+
+        folders:dict[str,int] = {}
+        files:dict[str,list[int]] = {}
+        read = 0
+        for folder, _, filenames in os.walk(addon.content_path.joinpath(maps_folder)):
+            folders[Path(folder).relative_to(addon.content_path).as_posix()] = os.stat(folder).st_mtime_ns
+            for filename in filenames:
+                if not filename.lower().endswith('.vmap'):
+                    continue
+                path = os.path.join(folder, filename)
+                file = Path(path).relative_to(addon.content_path).as_posix()
+                stat = os.stat(path)
+                files[file] = [stat.st_mtime_ns, stat.st_size]
+                if self.files.get(file) != files[file] or file not in strings:
+                    strings[file] = read_map_strings(path)
+                    read += 1
+        removed = len(set(self.files) - set(files))
+        self.write(folders, files, strings)
+        self.open()
+        return read, removed
+
+    def write(self, folders:dict[str,int], files:dict[str,list[int]], strings:dict[str,list[str]]):
+        """Write the index file.
+
+        Args:
+            folders (dict[str,int]): Searched folders and their modified times.
+            files (dict[str,list[int]]): Indexed maps and their stat signatures.
+            strings (dict[str,list[str]]): Strings of each map.
+        """
+        numbers = {file: n for n, file in enumerate(files)}
+        inverted:dict[bytes,list[int]] = {}
+        for file in files:
+            for string in strings[file]:
+                inverted.setdefault(string.encode(), []).append(numbers[file])
+
+        meta = json.dumps({'files': files, 'folders': folders}).encode()
+        entries = bytearray()
+        offsets:list[int] = []
+        start = _header.size + len(meta) + _uint.size * (1 + len(inverted))
+        for key in sorted(inverted):
+            maps = inverted[key]
+            offsets.append(start + len(entries))
+            entries += _uint.pack(len(key)) + key
+            entries += struct.pack(f'<{len(maps) + 1}I', len(maps), *maps)
+
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(temp_path, 'wb') as f:
+            f.write(_header.pack(_magic, _version, len(meta)))
+            f.write(meta)
+            f.write(_uint.pack(len(offsets)))
+            f.write(struct.pack(f'<{len(offsets)}I', *offsets))
+            f.write(entries)
+        os.replace(temp_path, self.path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='vmap_index', description='Find which maps use a string, such as an entity class, targetname, model or script.')
+    parser.add_argument('strings', nargs='*', help='exact strings to look up')
+    parser.add_argument('-s', '--search', action='store_true', help='match any string containing the text, ignoring case')
+    parser.add_argument('--rebuild', action='store_true', help='read every map again instead of only changed ones')
+    parser.add_argument('--time', action='store_true', help='print how long each lookup took')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = VmapIndex()
+    if args.rebuild or not index.open() or not index.is_up_to_date():
+        read, removed = index.update(args.rebuild)
+        print(f'Indexed {len(index.files)} maps, {read} read and {removed} removed in {time.perf_counter() - start:.3f}s')
+    elif not args.strings:
+        print(f'Index of {len(index.files)} maps is up to date')
+
+    for string in args.strings:
+        start = time.perf_counter()
+        if args.search:
+            results = index.search(string)
+        else:
+            results = {string: index.lookup(string)}
+        elapsed = time.perf_counter() - start
+        if args.time: print(f'{string}: {elapsed * 1000:.3f}ms')
+        if not any(results.values()):
+            print(f'{string}: not found')
+        for found, maps in results.items():
+            if not maps: continue
+            print(f'{found}:')
+            for file in maps:
+                print(f'  {file}')
+    index.close()